@@ -1,10 +1,19 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Query, Response, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from typing import List
+from fastapi.responses import JSONResponse, StreamingResponse
+from contextlib import asynccontextmanager
+from typing import List, Optional
+from datetime import date
+from metrics_stream_processor import MetricsStreamProcessor, KafkaTopicSource, claim_checkpoint_path
+from perf_metrics import ServiceMetrics, RequestMetricsMiddleware, CONTENT_TYPE
 from pydantic import BaseModel
-import requests
+import asyncio
+import httpx
 import json
+import operator
+import re
+import threading
+import time
 
 app = FastAPI()
 app.add_middleware(
@@ -14,37 +23,450 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# ----------- KSQLDB QUERY FUNCTION -----------
-def run_ksqldb_query(ksql: str):
-    KSQLDB_ENDPOINT = "http://192.168.56.101:8088/query"
-    headers = {
-        "Content-Type": "application/vnd.ksql.v1+json; charset=utf-8"
-    }
-    payload = {
-        "ksql": ksql,
-        "streamsProperties": {}
-    }
+# ----------- PERFORMANCE METRICS -----------
+SLOW_REQUEST_SECONDS = 1.0          # requests slower than this are logged with their timings
 
-    try:
-        response = requests.post(KSQLDB_ENDPOINT, headers=headers, json=payload, stream=True)
-        response.raise_for_status()
+service_metrics = ServiceMetrics(SLOW_REQUEST_SECONDS)
+app.add_middleware(RequestMetricsMiddleware, metrics=service_metrics)
+
+@app.get("/metrics")
+def read_metrics():
+    return Response(service_metrics.render(), media_type=CONTENT_TYPE)
+
+# ----------- KSQLDB CLIENT -----------
+KSQLDB_URL = "http://192.168.56.101:8088"
+KSQLDB_HTTP2 = False                # requires the h2 package (pip install "httpx[http2]")
+KSQLDB_CONNECT_TIMEOUT = 3.0        # seconds
+KSQLDB_READ_TIMEOUT = 10.0          # seconds between bytes of a query response
+KSQLDB_MAX_CONNECTIONS = 20         # pooled keep-alive connections to ksqlDB
+KSQLDB_MAX_CONCURRENT_QUERIES = 10  # queries in flight at once; further calls wait their turn
+
+class KsqlDBClient:
+    def __init__(self, base_url: str, http2: bool, connect_timeout: float, read_timeout: float,
+                 max_connections: int, max_concurrent_queries: int, metrics: ServiceMetrics = None):
+        self.base_url = base_url
+        self.metrics = metrics
+        self.http2 = http2
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self.semaphore = asyncio.Semaphore(max_concurrent_queries)
+        self.client = None
 
-        result = []
-        for line in response.iter_lines():
+    async def start(self):
+        self.client = httpx.AsyncClient(
+            base_url=self.base_url, http2=self.http2, timeout=self.timeout, limits=self.limits
+        )
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    def _request(self, ksql: str, timeout=None):
+        headers = {
+            "Content-Type": "application/vnd.ksql.v1+json; charset=utf-8"
+        }
+        payload = {
+            "ksql": ksql,
+            "streamsProperties": {}
+        }
+        return self.client.stream("POST", "/query", headers=headers, json=payload, timeout=timeout or self.timeout)
+
+    @staticmethod
+    async def _rows(response):
+        async for line in response.aiter_lines():
             if line:
-                decoded_line = line.decode("utf-8")
                 try:
-                    data = json.loads(decoded_line)
+                    data = json.loads(line)
                     if isinstance(data, list):
-                        result.append(data)
+                        yield data
                 except json.JSONDecodeError:
                     continue
-        return result
 
+    async def query(self, ksql: str) -> list:
+        async with self.semaphore:
+            start = time.perf_counter()
+            rows = None
+            try:
+                async with self._request(ksql) as response:
+                    response.raise_for_status()
+                    rows = [row async for row in self._rows(response)]
+                    return rows
+            finally:
+                if self.metrics is not None:
+                    table = re.search(r"\bFROM\s+(\w+)", ksql, re.IGNORECASE)
+                    self.metrics.observe_ksqldb(
+                        table.group(1).lower() if table else "unknown",
+                        time.perf_counter() - start,
+                        None if rows is None else len(rows)
+                    )
+
+    @asynccontextmanager
+    async def push_query(self, ksql: str):
+        # Long-lived EMIT CHANGES query: no read timeout and not counted against
+        # the pull-query concurrency limit
+        async with self._request(ksql, timeout=httpx.Timeout(None, connect=self.timeout.connect)) as response:
+            response.raise_for_status()
+            yield self._rows(response)
+
+ksqldb_client = KsqlDBClient(
+    KSQLDB_URL,
+    http2=KSQLDB_HTTP2,
+    connect_timeout=KSQLDB_CONNECT_TIMEOUT,
+    read_timeout=KSQLDB_READ_TIMEOUT,
+    max_connections=KSQLDB_MAX_CONNECTIONS,
+    max_concurrent_queries=KSQLDB_MAX_CONCURRENT_QUERIES,
+    metrics=service_metrics
+)
+
+# ----------- KSQLDB QUERY FUNCTION -----------
+async def run_ksqldb_query(ksql: str):
+    try:
+        return await ksqldb_client.query(ksql)
     except Exception as e:
         print(f"Error in ksqlDB query: {str(e)}")
         return []
 
+# ----------- MATERIALIZED METRICS -----------
+USE_MATERIALIZED_METRICS = True     # serve metrics from in-memory views kept current by push queries
+PUSH_QUERY_RETRY_DELAY = 1.0        # seconds before the first resubscribe attempt
+PUSH_QUERY_MAX_RETRY_DELAY = 30.0   # back-off cap between resubscribe attempts
+LIVE_KEEPALIVE_INTERVAL = 15.0      # seconds between keep-alives on idle live connections
+MAX_METRIC_ROWS = 5000              # upper bound for the limit parameter
+
+class ViewSubscription:
+    """
+    Pending changes for one live client. Changes are coalesced per key, so a slow
+    client only ever holds the latest row for each property instead of a growing queue.
+    """
+
+    def __init__(self):
+        self.pending = {}
+        self.changed = asyncio.Event()
+
+    def push(self, key: tuple, change: dict):
+        self.pending[key] = change
+        self.changed.set()
+
+    async def next_changes(self, timeout: float) -> list:
+        try:
+            await asyncio.wait_for(self.changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            return []
+        self.changed.clear()
+        changes = list(self.pending.values())
+        self.pending = {}
+        return changes
+
+class MaterializedView:
+    """Local keyed copy of a ksqlDB table, kept current by an EMIT CHANGES query."""
+
+    def __init__(self, name: str, table: str, columns: List[str], fields: List[str], key_size: int):
+        self.name = name
+        self.table = table
+        self.columns = dict(zip(fields, columns))
+        self.table_query = f"SELECT {', '.join(columns)} FROM {table}"
+        self.fields = fields
+        self.key_size = key_size
+        self.rows = {}
+        self.ready = False          # a snapshot has been loaded at least once
+        self.connected = False      # the push query is currently live
+        self.last_change = None     # wall-clock time of the last applied row
+        self.disconnected_at = None
+        self.loaded = asyncio.Event()
+        self.subscribers = set()
+
+    def key(self, row: list) -> tuple:
+        return tuple(row[:self.key_size])
+
+    def to_dict(self, row: list) -> dict:
+        return dict(zip(self.fields, row))
+
+    def key_dict(self, key: tuple) -> dict:
+        return dict(zip(self.fields, key))
+
+    def publish(self, key: tuple, row: dict):
+        change = {"op": "delete", "row": self.key_dict(key)} if row is None else {"op": "upsert", "row": row}
+        for subscriber in self.subscribers:
+            subscriber.push(key, change)
+
+    def is_tombstone(self, row: list) -> bool:
+        # ksqlDB marks a key leaving the table (e.g. property deactivated) with null values
+        return all(value is None for value in row[self.key_size:])
+
+    def replace(self, rows: list):
+        previous = self.rows
+        self.rows = {
+            self.key(row): self.to_dict(row)
+            for row in rows
+            if len(row) == len(self.fields) and not self.is_tombstone(row)
+        }
+        if self.subscribers:
+            # After a reconnect, tell live clients only what moved while the stream was down
+            for key, row in self.rows.items():
+                if previous.get(key) != row:
+                    self.publish(key, row)
+            for key in previous.keys() - self.rows.keys():
+                self.publish(key, None)
+        self.ready = True
+        self.loaded.set()
+        self.last_change = time.time()
+
+    def apply(self, row: list):
+        if len(row) != len(self.fields):
+            return
+        key = self.key(row)
+        if self.is_tombstone(row):
+            if self.rows.pop(key, None) is not None:
+                self.publish(key, None)
+        else:
+            new_row = self.to_dict(row)
+            if self.rows.get(key) != new_row:
+                self.rows[key] = new_row
+                self.publish(key, new_row)
+        self.last_change = time.time()
+
+    def snapshot(self) -> list:
+        return list(self.rows.values())
+
+    def subscribe(self):
+        # Registering and copying the rows happen without an await in between,
+        # so the subscriber sees every change made after its snapshot
+        subscription = ViewSubscription()
+        self.subscribers.add(subscription)
+        return subscription, self.snapshot()
+
+    def unsubscribe(self, subscription: ViewSubscription):
+        self.subscribers.discard(subscription)
+
+    def staleness(self) -> float:
+        # 0 while the push query is live, otherwise seconds since it dropped
+        if self.connected or self.disconnected_at is None:
+            return 0.0
+        return round(time.time() - self.disconnected_at, 3)
+
+    def status(self) -> dict:
+        return {
+            "ready": self.ready,
+            "connected": self.connected,
+            "rows": len(self.rows),
+            "subscribers": len(self.subscribers),
+            "last_change": self.last_change,
+            "stale": not self.connected,
+            "stale_seconds": self.staleness(),
+        }
+
+    async def maintain(self):
+        delay = PUSH_QUERY_RETRY_DELAY
+        while True:
+            try:
+                # Open the push query first so changes made while the snapshot loads are buffered
+                async with ksqldb_client.push_query(f"{self.table_query} EMIT CHANGES;") as changes:
+                    self.replace(await ksqldb_client.query(f"{self.table_query};"))
+                    self.connected = True
+                    self.disconnected_at = None
+                    delay = PUSH_QUERY_RETRY_DELAY
+                    async for row in changes:
+                        self.apply(row)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Push query for {self.name} failed: {e}")
+
+            if self.connected or self.disconnected_at is None:
+                self.disconnected_at = time.time()
+            self.connected = False
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, PUSH_QUERY_MAX_RETRY_DELAY)
+
+current_vacancies_view = MaterializedView(
+    "current_vacancies",
+    "CURRENT_VACANCIES",
+    ["PROPERTY_ID", "PROPERTY_NAME", "ADDRESS", "TOTAL_ROOMS", "VACANCIES"],
+    ["property_id", "property_name", "address", "total_rooms", "vacancies"],
+    key_size=1
+)
+daily_requests_view = MaterializedView(
+    "daily_requests",
+    "DAILY_REQUESTS",
+    ["REQUEST_DATE", "PROPERTY_ID", "PROPERTY_NAME", "ADDRESS", "TOTAL_REQUESTS"],
+    ["request_date", "property_id", "property_name", "address", "total_requests"],
+    key_size=2
+)
+monthly_requests_view = MaterializedView(
+    "monthly_requests",
+    "MONTHLY_REQUESTS",
+    ["YEAR_MONTH", "PROPERTY_ID", "PROPERTY_NAME", "ADDRESS", "TOTAL_REQUESTS"],
+    ["month_year", "property_id", "property_name", "address", "total_requests"],
+    key_size=2
+)
+VIEWS = [current_vacancies_view, daily_requests_view, monthly_requests_view]
+LIVE_METRICS = {
+    "current-vacancies": current_vacancies_view,
+    "daily-requests": daily_requests_view,
+    "monthly-requests": monthly_requests_view,
+}
+view_tasks = {}
+
+def ensure_view_maintained(view: MaterializedView):
+    # One push query per table, shared by the REST endpoints and every live client
+    if METRICS_BACKEND == "embedded":
+        return
+    task = view_tasks.get(view.name)
+    if task is None or task.done():
+        view_tasks[view.name] = asyncio.create_task(view.maintain())
+
+# ----------- EMBEDDED STREAM PROCESSOR -----------
+# With METRICS_BACKEND = "embedded" the views are fed by metrics_stream_processor.py,
+# which consumes the rentlok-* topics directly, instead of by ksqlDB push queries.
+METRICS_BACKEND = "ksqldb"          # "ksqldb" or "embedded"
+EMBEDDED_KAFKA_CONFIG = {
+    'bootstrap.servers': '192.168.56.101:9092',
+    'group.id': 'rentlok-metrics-embedded'   # partitions are assigned directly, never balanced by the group
+}
+EMBEDDED_STATE_DIR = "metrics_state"       # each instance claims its own checkpoint file in here
+EMBEDDED_CHECKPOINT_INTERVAL = 10.0 # seconds between state checkpoints
+EMBEDDED_POLL_TIMEOUT = 1.0         # seconds per consumer poll
+
+VIEWS_BY_NAME = {view.name: view for view in VIEWS}
+stream_processor_stop = threading.Event()
+stream_processor_thread = None
+
+def set_views_connected(connected: bool):
+    for view in VIEWS:
+        if view.connected and not connected:
+            view.disconnected_at = time.time()
+        view.connected = connected
+        if connected:
+            view.disconnected_at = None
+
+def run_stream_processor(processor: MetricsStreamProcessor, loop):
+    # Runs on its own thread; the processor state is only touched here and the views
+    # only on the event loop, which receives every changed row through call_soon_threadsafe
+    last_checkpoint = time.monotonic()
+    connected = None
+    try:
+        while not stream_processor_stop.is_set():
+            try:
+                processor.process(processor.poll(EMBEDDED_POLL_TIMEOUT))
+                healthy = True
+                if time.monotonic() - last_checkpoint >= EMBEDDED_CHECKPOINT_INTERVAL:
+                    processor.checkpoint()
+                    last_checkpoint = time.monotonic()
+            except Exception as e:
+                print(f"Metrics stream processor error: {e}")
+                healthy = False
+                stream_processor_stop.wait(PUSH_QUERY_RETRY_DELAY)
+            if healthy != connected:
+                connected = healthy
+                loop.call_soon_threadsafe(set_views_connected, healthy)
+    finally:
+        processor.close()
+
+def start_stream_processor(source=None):
+    global stream_processor_thread
+    loop = asyncio.get_running_loop()
+    processor = MetricsStreamProcessor(
+        source or KafkaTopicSource(EMBEDDED_KAFKA_CONFIG),
+        claim_checkpoint_path(EMBEDDED_STATE_DIR),
+        on_change=lambda metric, row: loop.call_soon_threadsafe(VIEWS_BY_NAME[metric].apply, row)
+    )
+    processor.restore()
+    for view in VIEWS:
+        view.replace(processor.rows(view.name))
+
+    stream_processor_stop.clear()
+    stream_processor_thread = threading.Thread(
+        target=run_stream_processor, args=(processor, loop), name="metrics-stream-processor", daemon=True
+    )
+    stream_processor_thread.start()
+    return processor
+
+async def stop_stream_processor():
+    global stream_processor_thread
+    if stream_processor_thread is not None:
+        stream_processor_stop.set()
+        await asyncio.to_thread(stream_processor_thread.join)
+        stream_processor_thread = None
+
+# ----------- QUERY FILTERS -----------
+# Filters are (field, operator, value) tuples. Field names and operators come from
+# this module only; values supplied by clients are bound as typed ksqlDB literals.
+FILTER_OPERATORS = {"=": operator.eq, ">=": operator.ge, "<=": operator.le}
+
+def ksql_literal(value) -> str:
+    if isinstance(value, bool):
+        raise ValueError("Unsupported ksqlDB literal")
+    if isinstance(value, int):
+        return str(value)
+    if isinstance(value, date):
+        value = value.isoformat()
+    if isinstance(value, str):
+        return "'" + value.replace("'", "''") + "'"
+    raise ValueError("Unsupported ksqlDB literal")
+
+def build_pull_query(view: MaterializedView, filters: list = (), limit: int = None) -> str:
+    ksql = view.table_query
+    if filters:
+        ksql += " WHERE " + " AND ".join(
+            f"{view.columns[field]} {op} {ksql_literal(value)}" for field, op, value in filters
+        )
+    if limit is not None:
+        ksql += f" LIMIT {int(limit)}"
+    return ksql + ";"
+
+def matches(row: dict, filters: list) -> bool:
+    return all(FILTER_OPERATORS[op](row[field], value) for field, op, value in filters)
+
+async def read_view(view: MaterializedView, response: Response, filters: list = (), limit: int = None, key: tuple = None, strict: bool = False) -> list:
+    # Answer from memory once the view is loaded; fall back to a pull query until then
+    if (USE_MATERIALIZED_METRICS or METRICS_BACKEND == "embedded") and view.ready:
+        response.headers["X-Metrics-Source"] = "materialized"
+        response.headers["X-Metrics-Stale"] = "true" if not view.connected else "false"
+        response.headers["X-Metrics-Stale-Seconds"] = str(view.staleness())
+        if key is not None:
+            row = view.rows.get(key)
+            return [row] if row is not None else []
+        rows = [row for row in view.rows.values() if matches(row, filters)]
+        return rows[:limit] if limit is not None else rows
+
+    response.headers["X-Metrics-Source"] = "ksqldb"
+    ksql = build_pull_query(view, filters, limit)
+    # strict: let ksqlDB errors propagate instead of answering with an empty list
+    rows = await (ksqldb_client.query(ksql) if strict else run_ksqldb_query(ksql))
+    return [
+        view.to_dict(row) for row in rows
+        if isinstance(row, list) and len(row) == len(view.fields) and not view.is_tombstone(row)
+    ]
+
+def date_filters(field: str, property_id: Optional[int], date_from, date_to) -> list:
+    filters = []
+    if property_id is not None:
+        filters.append(("property_id", "=", property_id))
+    if date_from is not None:
+        filters.append((field, ">=", str(date_from)))
+    if date_to is not None:
+        filters.append((field, "<=", str(date_to)))
+    return filters
+
+@app.on_event("startup")
+async def start_ksqldb_client():
+    await ksqldb_client.start()
+    if METRICS_BACKEND == "embedded":
+        start_stream_processor()
+    elif USE_MATERIALIZED_METRICS:
+        for view in VIEWS:
+            ensure_view_maintained(view)
+
+@app.on_event("shutdown")
+async def close_ksqldb_client():
+    await stop_stream_processor()
+    for task in view_tasks.values():
+        task.cancel()
+    await asyncio.gather(*view_tasks.values(), return_exceptions=True)
+    view_tasks.clear()
+    await ksqldb_client.close()
+
 # ----------- RESPONSE MODELS -----------
 class CurrentVacancy(BaseModel):
     property_id: int
@@ -70,58 +492,137 @@ class MonthlyRequest(BaseModel):
 # ----------- API ENDPOINTS -----------
 
 @app.get("/current-vacancies", response_model=List[CurrentVacancy])
-def get_current_vacancies():
-    ksql = """
-        SELECT PROPERTY_ID, PROPERTY_NAME, ADDRESS, TOTAL_ROOMS, VACANCIES
-        FROM CURRENT_VACANCIES;
-    """
-    rows = run_ksqldb_query(ksql)
-    data = [row for row in rows if isinstance(row, list) and len(row) == 5]
-    return [
-        {
-            "property_id": row[0],
-            "property_name": row[1],
-            "address": row[2],
-            "total_rooms": row[3],
-            "vacancies": row[4]
-        }
-        for row in data
-    ]
+async def get_current_vacancies(response: Response, property_id: Optional[int] = None):
+    filters = [("property_id", "=", property_id)] if property_id is not None else []
+    return await read_view(current_vacancies_view, response, filters)
+
+@app.get("/properties/{property_id}/vacancy", response_model=CurrentVacancy)
+async def get_property_vacancy(property_id: int, response: Response):
+    # Single-key lookup on the table's primary key
+    rows = await read_view(current_vacancies_view, response, [("property_id", "=", property_id)], key=(property_id,))
+    if not rows:
+        raise HTTPException(status_code=404, detail="Property not found")
+    return rows[0]
 
 @app.get("/daily-requests", response_model=List[DailyRequest])
-def get_daily_requests():
-    ksql = """
-        SELECT REQUEST_DATE, PROPERTY_ID, PROPERTY_NAME, ADDRESS, TOTAL_REQUESTS
-        FROM DAILY_REQUESTS;
-    """
-    rows = run_ksqldb_query(ksql)
-    data = [row for row in rows if isinstance(row, list) and len(row) == 5]
-    return [
-        {
-            "request_date": row[0],
-            "property_id": row[1],
-            "property_name": row[2],
-            "address": row[3],
-            "total_requests": row[4]
-        }
-        for row in data
-    ]
+async def get_daily_requests(
+    response: Response,
+    property_id: Optional[int] = None,
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_METRIC_ROWS)
+):
+    filters = date_filters("request_date", property_id, date_from, date_to)
+    return await read_view(daily_requests_view, response, filters, limit)
 
 @app.get("/monthly-requests", response_model=List[MonthlyRequest])
-def get_monthly_requests():
-    ksql = """
-        SELECT YEAR_MONTH, PROPERTY_ID, PROPERTY_NAME, ADDRESS, TOTAL_REQUESTS
-        FROM MONTHLY_REQUESTS;
-    """
-    rows = run_ksqldb_query(ksql)
-    data = [row for row in rows if isinstance(row, list) and len(row) == 5]
-    return [
-        {
-            "month_year": row[0],
-            "property_id": row[1],
-            "property_name": row[2],
-            "address": row[3],
-            "total_requests": row[4]
-        }
-        for row in data
-    ]
+async def get_monthly_requests(
+    response: Response,
+    property_id: Optional[int] = None,
+    month_from: Optional[str] = Query(None, alias="from", regex=r"^\d{4}-\d{2}$"),
+    month_to: Optional[str] = Query(None, alias="to", regex=r"^\d{4}-\d{2}$"),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_METRIC_ROWS)
+):
+    filters = date_filters("month_year", property_id, month_from, month_to)
+    return await read_view(monthly_requests_view, response, filters, limit)
+
+@app.get("/views/status")
+async def get_views_status():
+    return {view.name: view.status() for view in VIEWS}
+
+# ----------- DASHBOARD -----------
+DASHBOARD_METRIC_TIMEOUT = 5.0      # seconds before a single dashboard metric is reported as failed
+
+# Every metric registered here is loaded by /dashboard
+DASHBOARD_METRICS = {
+    "current_vacancies": current_vacancies_view,
+    "daily_requests": daily_requests_view,
+    "monthly_requests": monthly_requests_view,
+}
+
+async def load_dashboard_metric(view: MaterializedView) -> dict:
+    response = Response()
+    started = time.perf_counter()
+    try:
+        rows = await asyncio.wait_for(read_view(view, response, strict=True), DASHBOARD_METRIC_TIMEOUT)
+    except asyncio.TimeoutError:
+        return {"status": "error", "error": "timeout"}
+    except Exception as e:
+        print(f"Dashboard metric {view.name} failed: {e}")
+        return {"status": "error", "error": str(e) or type(e).__name__}
+    return {
+        "status": "ok",
+        "source": response.headers["X-Metrics-Source"],
+        "stale": response.headers.get("X-Metrics-Stale") == "true",
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+        "rows": rows,
+    }
+
+@app.get("/dashboard")
+async def get_dashboard():
+    # All metrics load concurrently; a failing metric is reported in its own entry
+    results = await asyncio.gather(*(load_dashboard_metric(view) for view in DASHBOARD_METRICS.values()))
+    return dict(zip(DASHBOARD_METRICS, results))
+
+# ----------- LIVE ENDPOINTS -----------
+# Clients receive the full result set once, then only rows that changed, as they
+# arrive from the shared push query.
+
+def get_live_view(metric: str) -> MaterializedView:
+    view = LIVE_METRICS.get(metric)
+    if view is None:
+        raise HTTPException(status_code=404, detail="Metric not found")
+    ensure_view_maintained(view)
+    return view
+
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.get("/stream/{metric}")
+async def stream_metric(metric: str):
+    view = get_live_view(metric)
+
+    async def events():
+        await view.loaded.wait()
+        subscription, rows = view.subscribe()
+        try:
+            yield sse_event("snapshot", rows)
+            # Runs until the client disconnects and the response cancels this generator
+            while True:
+                changes = await subscription.next_changes(LIVE_KEEPALIVE_INTERVAL)
+                if not changes:
+                    yield ": keep-alive\n\n"
+                for change in changes:
+                    yield sse_event(change["op"], change["row"])
+        finally:
+            view.unsubscribe(subscription)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.websocket("/ws/{metric}")
+async def websocket_metric(websocket: WebSocket, metric: str):
+    view = LIVE_METRICS.get(metric)
+    if view is None:
+        await websocket.close(code=1008)
+        return
+    ensure_view_maintained(view)
+
+    await websocket.accept()
+    await view.loaded.wait()
+    subscription, rows = view.subscribe()
+    try:
+        await websocket.send_json({"type": "snapshot", "rows": rows})
+        while True:
+            changes = await subscription.next_changes(LIVE_KEEPALIVE_INTERVAL)
+            if not changes:
+                await websocket.send_json({"type": "keep-alive"})
+            for change in changes:
+                await websocket.send_json({"type": change["op"], "row": change["row"]})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        view.unsubscribe(subscription)
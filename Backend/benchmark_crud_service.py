@@ -0,0 +1,690 @@
+"""
+Load benchmark for app_postgres_service.py.
+
+Compares the sync (threadpool) and async (asyncpg) database modes by running the same
+read workload against two running instances of the service:
+
+    RENTLOK_ASYNC_DB=false uvicorn app_postgres_service:app --port 8000
+    RENTLOK_ASYNC_DB=true  uvicorn app_postgres_service:app --port 8001
+    python benchmark_crud_service.py modes --sync-url http://localhost:8000 --async-url http://localhost:8001
+
+Each virtual client keeps one request in flight, so --concurrency is the number of
+simultaneous mobile clients being simulated.
+
+The booking-race scenario fires concurrent POST /bookings/ requests at a few rooms and
+checks that each room ends up with at most one active booking:
+
+    python benchmark_crud_service.py booking-race --url http://localhost:8000 --rooms 10 --attempts 50
+
+The workload suite runs the app in-process against a local PostgreSQL (DATABASE_URL in
+app_postgres_service.py), with the outbox relayed to a stub producer instead of Kafka:
+
+    python benchmark_crud_service.py seed --reset --properties 50 --rooms 40 --years 3
+    python benchmark_crud_service.py suite --output results-new.json
+    python benchmark_crud_service.py compare results-old.json results-new.json
+
+seed generates a deterministic data set (--random-seed): properties x rooms, each room with
+back-to-back bookings over --years, monthly payments per booking and daily requests per
+property. suite replays the scripted workloads (dashboard browse, booking burst, payment
+month-end spike) and reports p50/p95/p99 latency, throughput and SQL statements per
+request for every endpoint. The suite writes to the database, so reseed before runs that
+are meant to be compared.
+
+read-path compares the ORM + response-model list path with the plain-row fast path
+(FAST_READ_PATH) in-process on the seeded data, checking that both return the same bytes:
+
+    python benchmark_crud_service.py read-path --requests 50
+"""
+from datetime import date, datetime, timedelta
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import httpx
+from sqlalchemy import insert, select, func, text
+from perf_metrics import RequestStats, current_request
+
+DEFAULT_PATHS = [
+    "/properties/?limit=50",
+    "/rooms/?limit=50",
+    "/bookings/?limit=50",
+    "/payments/?limit=50",
+    "/requests/?limit=50",
+]
+
+
+def percentile(sorted_values: list, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize(name: str, latencies: list, errors: int, elapsed: float) -> dict:
+    latencies = sorted(latencies)
+    return {
+        "name": name,
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 2) if latencies else 0.0,
+    }
+
+
+async def run_load(base_url: str, paths: list, concurrency: int, total_requests: int, timeout: float = 30.0) -> dict:
+    latencies = []
+    errors = 0
+    next_request = 0
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout) as client:
+        async def client_loop():
+            nonlocal errors, next_request
+            while next_request < total_requests:
+                path = paths[next_request % len(paths)]
+                next_request += 1
+                start = time.perf_counter()
+                try:
+                    response = await client.get(path)
+                    response.raise_for_status()
+                    latencies.append(time.perf_counter() - start)
+                except httpx.HTTPError:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    return summarize(base_url, latencies, errors, elapsed)
+
+
+def print_result(label: str, result: dict):
+    print(
+        f"{label:<8} {result['requests']:>7} req  {result['errors']:>5} err  "
+        f"{result['throughput_rps']:>9.1f} req/s  p50 {result['p50_ms']:>8.2f} ms  "
+        f"p95 {result['p95_ms']:>8.2f} ms  p99 {result['p99_ms']:>8.2f} ms"
+    )
+
+
+async def compare_modes(args):
+    for label, url in (("sync", args.sync_url), ("async", args.async_url)):
+        # Warm up connection pools before measuring
+        await run_load(url, args.paths, min(args.concurrency, 20), 100)
+        print_result(label, await run_load(url, args.paths, args.concurrency, args.requests))
+
+
+async def booking_race(args):
+    async with httpx.AsyncClient(base_url=args.url, timeout=30.0) as client:
+        response = await client.post("/properties/", json={
+            "property_name": "Booking race", "address": "benchmark", "no_of_rooms": args.rooms
+        })
+        response.raise_for_status()
+        property_id = response.json()["property_id"]
+        response = await client.post("/rooms/bulk", json=[
+            {"room_no": str(i + 1), "floor_no": 1, "property_id": property_id,
+             "operational_status": "vacant", "rent_per_month": 1000}
+            for i in range(args.rooms)
+        ])
+        response.raise_for_status()
+        room_ids = [room["room_id"] for room in response.json()]
+        response = await client.post("/tenants/bulk", json=[
+            {"name": f"Tenant {i + 1}", "phone_no": str(9000000000 + i)} for i in range(args.attempts)
+        ])
+        response.raise_for_status()
+        tenant_ids = [tenant["tenant_id"] for tenant in response.json()]
+
+    latencies = []
+    outcomes = {"booked": 0, "conflict": 0}
+    errors = 0
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=30.0) as client:
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def attempt(room_id: int, tenant_id: int):
+            nonlocal errors
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    response = await client.post("/bookings/", json={
+                        "room_id": room_id, "tenant_id": tenant_id, "property_id": property_id, "status": "active"
+                    })
+                except httpx.HTTPError:
+                    errors += 1
+                    return
+                latencies.append(time.perf_counter() - start)
+                if response.status_code == 200:
+                    outcomes["booked"] += 1
+                elif response.status_code == 409:
+                    outcomes["conflict"] += 1
+                else:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(
+            attempt(room_id, tenant_id) for room_id in room_ids for tenant_id in tenant_ids
+        ))
+        elapsed = time.perf_counter() - start
+
+        response = await client.get(f"/properties/{property_id}/detail", params={"depth": 2})
+        response.raise_for_status()
+        double_booked = [
+            room["room_id"] for room in response.json()["rooms"]
+            if sum(booking["status"] == "active" for booking in room["bookings"]) > 1
+        ]
+
+    print_result("race", summarize(args.url, latencies, errors, elapsed))
+    print(f"booked {outcomes['booked']}  conflicts {outcomes['conflict']}  double-booked rooms {len(double_booked)}")
+    if double_booked:
+        print(f"Rooms with more than one active booking: {double_booked}")
+    if double_booked or errors:
+        sys.exit(1)
+
+
+ROOM_TYPES = {"single": 6000, "double": 9000, "suite": 14000}     # base monthly rent per type
+PAYMENT_TYPES = ["upi", "cash", "bank_transfer"]
+SEED_BATCH_SIZE = 5000
+
+
+def add_months(day: date, months: int) -> date:
+    month = day.month - 1 + months
+    return date(day.year + month // 12, month % 12 + 1, min(day.day, 28))
+
+
+def generate_bookings(rng: random.Random, rent: float, start: date, today: date, vacant: bool) -> list:
+    # Back-to-back stays of 3-18 months with short gaps; a room that is not vacant
+    # ends with an active booking running past today
+    bookings = []
+    move_in = start + timedelta(days=rng.randint(0, 60))
+    while move_in < today:
+        move_out = add_months(move_in, rng.randint(3, 18))
+        if move_out > today:
+            if vacant:
+                break
+            bookings.append((move_in, None if rng.random() < 0.5 else move_out, "active"))
+            break
+        bookings.append((move_in, move_out, "terminated" if rng.random() < 0.1 else "completed"))
+        move_in = move_out + timedelta(days=rng.randint(0, 45))
+    return [(move_in, move_out, status, rent) for move_in, move_out, status in bookings]
+
+
+def generate_payments(rng: random.Random, booking_id: int, booking: tuple, today: date) -> list:
+    move_in, move_out, status, rent = booking
+    payments = []
+    month = move_in
+    while month < (move_out or today) and month <= today:
+        # Some tenants fall behind in the last months of a running booking
+        overdue = status == "active" and (today - month).days < 90 and rng.random() < 0.15
+        payments.append({
+            "booking_id": booking_id,
+            "payment_type": rng.choice(PAYMENT_TYPES),
+            "payment_status": "pending" if overdue else "paid",
+            "amount": rent,
+            "payment_date": min(today, month + timedelta(days=rng.randint(0, 9))),
+            "payment_month": month.strftime("%Y-%m"),
+        })
+        month = add_months(month, 1)
+    return payments
+
+
+def insert_rows(conn, table, rows: list, returning=None) -> list:
+    ids = []
+    for offset in range(0, len(rows), SEED_BATCH_SIZE):
+        batch = rows[offset:offset + SEED_BATCH_SIZE]
+        if returning is None:
+            conn.execute(insert(table), batch)
+        else:
+            ids.extend(conn.execute(insert(table).returning(returning), batch).scalars().all())
+    return ids
+
+
+def seed_dataset(args) -> dict:
+    # Imported here so the HTTP-only subcommands do not need database access
+    import app_postgres_service as service
+    from schema_migrations import ensure_partitions
+
+    rng = random.Random(args.random_seed)
+    today = date.today()
+    start = add_months(today.replace(day=1), -12 * args.years)
+    counts = {}
+    # Payments and requests are partitioned by month; history needs its partitions first
+    ensure_partitions(service.engine, first_month=start)
+
+    with service.engine.begin() as conn:
+        if args.reset:
+            conn.execute(text(
+                "TRUNCATE payments, bookings, requests, rooms, tenants, properties, outbox, archived_payment_totals, "
+                "properties_history, rooms_history, tenants_history, bookings_history RESTART IDENTITY CASCADE"
+            ))
+
+        property_ids = insert_rows(conn, service.Property, [
+            {"property_name": f"Property {i + 1}", "address": f"{i + 1} Benchmark Road", "no_of_rooms": args.rooms}
+            for i in range(args.properties)
+        ], service.Property.property_id)
+
+        rooms, room_bookings = [], []
+        for property_id in property_ids:
+            for i in range(args.rooms):
+                room_type = rng.choice(list(ROOM_TYPES))
+                rent = ROOM_TYPES[room_type] + 500 * rng.randint(0, 6)
+                status = rng.choices(["occupied", "vacant", "damaged"], weights=[80, 17, 3])[0]
+                rooms.append({
+                    "room_no": str(100 * (i // 10 + 1) + i % 10 + 1),
+                    "floor_no": i // 10 + 1,
+                    "property_id": property_id,
+                    "operational_status": status,
+                    "room_type": room_type,
+                    "rent_per_month": rent,
+                })
+                room_bookings.append(generate_bookings(rng, rent, start, today, status != "occupied"))
+        room_ids = insert_rows(conn, service.Room, rooms, service.Room.room_id)
+
+        booking_count = sum(len(bookings) for bookings in room_bookings)
+        tenant_ids = insert_rows(conn, service.Tenant, [
+            {"name": f"Tenant {i + 1}", "phone_no": str(9000000000 + i)} for i in range(booking_count)
+        ], service.Tenant.tenant_id)
+
+        bookings, booking_specs = [], []
+        for room, room_id, specs in zip(rooms, room_ids, room_bookings):
+            for move_in, move_out, status, rent in specs:
+                bookings.append({
+                    "room_id": room_id,
+                    "tenant_id": tenant_ids[len(bookings)],
+                    "property_id": room["property_id"],
+                    "move_in_date": move_in,
+                    "move_out_date": move_out,
+                    "status": status,
+                })
+                booking_specs.append((move_in, move_out, status, rent))
+        booking_ids = insert_rows(conn, service.Booking, bookings, service.Booking.booking_id)
+
+        payments = []
+        for booking_id, spec in zip(booking_ids, booking_specs):
+            payments.extend(generate_payments(rng, booking_id, spec, today))
+        insert_rows(conn, service.Payment, payments)
+
+        requests = []
+        day = start
+        while day <= today:
+            for property_id in property_ids:
+                for _ in range(int(args.requests_per_day) + (rng.random() < args.requests_per_day % 1)):
+                    requests.append({
+                        "property_id": property_id,
+                        "tenant_name": f"Lead {len(requests) + 1}",
+                        "phone_no": str(8000000000 + len(requests)),
+                        "request_date": day,
+                    })
+            day += timedelta(days=1)
+        insert_rows(conn, service.Request, requests)
+
+        counts = {
+            "properties": len(property_ids), "rooms": len(room_ids), "tenants": len(tenant_ids),
+            "bookings": len(booking_ids), "payments": len(payments), "requests": len(requests),
+        }
+
+    with service.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("ANALYZE"))
+    service.refresh_analytics_views()
+    return counts
+
+
+def seed(args):
+    start = time.perf_counter()
+    counts = seed_dataset(args)
+    print(", ".join(f"{count} {name}" for name, count in counts.items()))
+    print(f"Seeded in {time.perf_counter() - start:.1f} s")
+
+
+# Each workload step returns (label, method, path, json body); labels group the results
+# per endpoint, so they use the route template rather than the concrete path
+def dashboard_browse(rng: random.Random, targets: dict) -> tuple:
+    property_id = rng.choice(targets["properties"])
+    room_id = rng.choice(targets["rooms"])[0]
+    steps = [
+        (20, ("GET /properties/", "GET", "/properties/?limit=50", None)),
+        (20, ("GET /properties/{id}/detail", "GET", f"/properties/{property_id}/detail?depth=2", None)),
+        (15, ("GET /rooms/search", "GET", f"/rooms/search?property_id={property_id}", None)),
+        (15, ("GET /rooms/{id}", "GET", f"/rooms/{room_id}", None)),
+        (10, ("GET /analytics/occupancy", "GET", f"/analytics/occupancy?property_id={property_id}", None)),
+        (10, ("GET /analytics/revenue", "GET", f"/analytics/revenue?property_id={property_id}", None)),
+        (10, ("GET /requests/", "GET", "/requests/?limit=50", None)),
+    ]
+    return rng.choices([step for weight, step in steps], weights=[weight for weight, step in steps])[0]
+
+
+def booking_burst(rng: random.Random, targets: dict) -> tuple:
+    room_id, property_id = rng.choice(targets["rooms"])
+    if rng.random() < 0.6:
+        body = {
+            "room_id": room_id,
+            "tenant_id": rng.choice(targets["tenants"]),
+            "property_id": property_id,
+            "move_out_date": (date.today() + timedelta(days=rng.randint(30, 365))).isoformat(),
+            "status": "active",
+        }
+        return ("POST /bookings/", "POST", "/bookings/", body)
+    if rng.random() < 0.5:
+        return ("GET /rooms/search", "GET", f"/rooms/search?property_id={property_id}&available_from={date.today()}", None)
+    return ("GET /rooms/{id}/calendar", "GET", f"/rooms/{room_id}/calendar", None)
+
+
+def payment_month_end(rng: random.Random, targets: dict) -> tuple:
+    booking_id, property_id, rent = rng.choice(targets["bookings"])
+    if rng.random() < 0.7:
+        body = {
+            "booking_id": booking_id,
+            "payment_type": rng.choice(PAYMENT_TYPES),
+            "payment_status": "paid",
+            "amount": rent,
+            "payment_month": date.today().strftime("%Y-%m"),
+        }
+        return ("POST /payments/", "POST", "/payments/", body)
+    if rng.random() < 0.5:
+        return ("GET /analytics/arrears", "GET", f"/analytics/arrears?property_id={property_id}", None)
+    return ("GET /payments/", "GET", "/payments/?limit=50", None)
+
+
+WORKLOADS = {
+    "dashboard-browse": dashboard_browse,
+    "booking-burst": booking_burst,
+    "payment-month-end": payment_month_end,
+}
+
+
+def load_targets(service) -> tuple:
+    with service.engine.connect() as conn:
+        targets = {
+            "properties": conn.execute(
+                select(service.Property.property_id).where(service.Property.is_active == 1)
+            ).scalars().all(),
+            "rooms": [tuple(row) for row in conn.execute(
+                select(service.Room.room_id, service.Room.property_id).where(service.Room.is_active == 1)
+            )],
+            "tenants": conn.execute(
+                select(service.Tenant.tenant_id).where(service.Tenant.is_active == 1).limit(10000)
+            ).scalars().all(),
+            "bookings": [tuple(row) for row in conn.execute(
+                select(service.Booking.booking_id, service.Booking.property_id, service.Room.rent_per_month)
+                .join(service.Room, service.Room.room_id == service.Booking.room_id)
+                .where(service.Booking.is_active == 1, service.Booking.status == "active")
+            )],
+        }
+        dataset = {
+            table: conn.execute(select(func.count()).select_from(model)).scalar_one()
+            for table, model in (
+                ("properties", service.Property), ("rooms", service.Room), ("tenants", service.Tenant),
+                ("bookings", service.Booking), ("payments", service.Payment), ("requests", service.Request),
+            )
+        }
+    if not all(targets.values()):
+        raise SystemExit("The database has no active properties, rooms, tenants or bookings: run seed first")
+    return targets, dataset
+
+
+async def run_workload(service, name: str, targets: dict, args) -> dict:
+    rng = random.Random(f"{args.random_seed}:{name}")
+    plan = [WORKLOADS[name](rng, targets) for _ in range(args.warmup + args.requests)]
+    stats = {}
+    next_request = 0
+
+    transport = httpx.ASGITransport(app=service.app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=60.0) as client:
+        async def client_loop(steps: list, record: bool):
+            nonlocal next_request
+            while next_request < len(steps):
+                label, method, path, body = steps[next_request]
+                next_request += 1
+                # The metrics middleware counts the request's statements into this object
+                request_stats = RequestStats()
+                current_request.set(request_stats)
+                start = time.perf_counter()
+                try:
+                    response = await client.request(method, path, json=body)
+                except httpx.HTTPError:
+                    response = None
+                latency = time.perf_counter() - start
+                if not record:
+                    continue
+                entry = stats.setdefault(label, {"latencies": [], "errors": 0, "conflicts": 0, "queries": 0})
+                if response is None or (response.status_code >= 400 and response.status_code != 409):
+                    entry["errors"] += 1
+                    continue
+                if response.status_code == 409:
+                    entry["conflicts"] += 1
+                entry["latencies"].append(latency)
+                entry["queries"] += request_stats.statements
+
+        await asyncio.gather(*(client_loop(plan[:args.warmup], False) for _ in range(args.concurrency)))
+        next_request = 0
+        measured = plan[args.warmup:]
+        start = time.perf_counter()
+        await asyncio.gather(*(client_loop(measured, True) for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - start
+
+    endpoints = {}
+    for label, entry in sorted(stats.items()):
+        result = summarize(label, entry["latencies"], entry["errors"], elapsed)
+        result["conflicts"] = entry["conflicts"]
+        result["queries_per_request"] = round(entry["queries"] / len(entry["latencies"]), 2) if entry["latencies"] else 0.0
+        endpoints[label] = result
+
+    all_latencies = [latency for entry in stats.values() for latency in entry["latencies"]]
+    overall = summarize(name, all_latencies, sum(entry["errors"] for entry in stats.values()), elapsed)
+    queries = sum(entry["queries"] for entry in stats.values())
+    overall["queries_per_request"] = round(queries / len(all_latencies), 2) if all_latencies else 0.0
+    return {"workload": name, "overall": overall, "endpoints": endpoints}
+
+
+def relay_outbox(service, publisher, stop: threading.Event):
+    # Drains the outbox like outbox_relay.py would, so the write path carries its real cost
+    from outbox_relay import relay_batch
+    while not stop.is_set():
+        db = service.SessionLocal()
+        try:
+            sent = relay_batch(db, publisher)
+        except Exception as e:
+            db.rollback()
+            print(f"Outbox relay error: {e}")
+            sent = 0
+        finally:
+            db.close()
+        if not sent:
+            stop.wait(0.2)
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_endpoint(label: str, result: dict):
+    print(
+        f"  {label:<30} {result['requests']:>6} req  {result['errors']:>4} err  {result['conflicts']:>5} 409  "
+        f"p50 {result['p50_ms']:>8.2f}  p95 {result['p95_ms']:>8.2f}  p99 {result['p99_ms']:>8.2f} ms  "
+        f"{result['queries_per_request']:>5.1f} q/req"
+    )
+
+
+async def run_suite(args):
+    import app_postgres_service as service
+    from kafka_publisher import StubPublisher
+
+    targets, dataset = load_targets(service)
+    publisher = StubPublisher()
+    stop = threading.Event()
+    relay = threading.Thread(target=relay_outbox, args=(service, publisher, stop), name="benchmark-relay", daemon=True)
+
+    await service.app.router.startup()
+    relay.start()
+    workloads = []
+    try:
+        for name in args.workloads:
+            result = await run_workload(service, name, targets, args)
+            workloads.append(result)
+            print(name)
+            print_result("total", result["overall"])
+            for label, endpoint in result["endpoints"].items():
+                print_endpoint(label, endpoint)
+    finally:
+        stop.set()
+        relay.join()
+        await service.app.router.shutdown()
+
+    results = {
+        "benchmark": "rentlok-crud",
+        "created_at": datetime.utcnow().isoformat(timespec="seconds"),
+        "git_commit": git_commit(),
+        "db_mode": "async" if service.USE_ASYNC_DB else "sync",
+        "config": {
+            "requests": args.requests,
+            "warmup": args.warmup,
+            "concurrency": args.concurrency,
+            "random_seed": args.random_seed,
+        },
+        "dataset": dataset,
+        "published_events": dict(publisher.messages),
+        "workloads": workloads,
+    }
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+def compare_results(args):
+    with open(args.baseline) as f:
+        baseline = {workload["workload"]: workload for workload in json.load(f)["workloads"]}
+    with open(args.current) as f:
+        current = json.load(f)["workloads"]
+
+    regressions = 0
+    for workload in current:
+        before = baseline.get(workload["workload"])
+        if before is None:
+            continue
+        print(workload["workload"])
+        for label, result in workload["endpoints"].items():
+            old = before["endpoints"].get(label)
+            if old is None:
+                continue
+            p95_change = (result["p95_ms"] - old["p95_ms"]) / old["p95_ms"] * 100 if old["p95_ms"] else 0.0
+            regressed = p95_change > args.threshold or result["queries_per_request"] > old["queries_per_request"]
+            regressions += regressed
+            print(
+                f"  {label:<30} p95 {old['p95_ms']:>8.2f} -> {result['p95_ms']:>8.2f} ms ({p95_change:+6.1f}%)  "
+                f"q/req {old['queries_per_request']:>5.1f} -> {result['queries_per_request']:>5.1f}"
+                f"{'  REGRESSION' if regressed else ''}"
+            )
+    if regressions:
+        print(f"{regressions} endpoint(s) regressed")
+        sys.exit(1)
+
+
+READ_PATH_PATHS = [
+    "/rooms/?limit=1000",
+    "/bookings/?limit=1000",
+    "/payments/?limit=1000",
+    "/requests/?limit=1000",
+    "/payments/?limit=1000&stream=true",
+]
+
+
+async def compare_read_paths(args):
+    import app_postgres_service as service
+
+    transport = httpx.ASGITransport(app=service.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=60.0) as client:
+        print(f"{'path':<36} {'path mode':<9} {'p50 ms':>8} {'cpu ms/req':>11}")
+        for path in args.paths:
+            bodies = {}
+            cpu = {}
+            for fast in (False, True):
+                service.FAST_READ_PATH = fast
+                for _ in range(3):
+                    await client.get(path)
+                latencies = []
+                cpu_start = time.process_time()
+                for _ in range(args.requests):
+                    start = time.perf_counter()
+                    response = await client.get(path)
+                    response.raise_for_status()
+                    latencies.append(time.perf_counter() - start)
+                cpu[fast] = (time.process_time() - cpu_start) / args.requests * 1000
+                bodies[fast] = response.content
+                label = "fast" if fast else "orm"
+                print(f"{path:<36} {label:<9} {statistics.median(latencies) * 1000:>8.2f} {cpu[fast]:>11.2f}")
+            same = "identical" if bodies[False] == bodies[True] else "DIFFERENT"
+            print(f"{'':<36} {'':<9} cpu x{cpu[False] / cpu[True]:.1f}, {len(bodies[True])} bytes, {same}")
+    service.FAST_READ_PATH = True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the RentLok CRUD service")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    modes = subparsers.add_parser("modes", help="compare sync and async database modes")
+    modes.add_argument("--sync-url", default="http://localhost:8000")
+    modes.add_argument("--async-url", default="http://localhost:8001")
+    modes.add_argument("--concurrency", type=int, default=500)
+    modes.add_argument("--requests", type=int, default=20000)
+    modes.add_argument("--paths", nargs="+", default=DEFAULT_PATHS)
+
+    race = subparsers.add_parser("booking-race", help="book the same rooms concurrently")
+    race.add_argument("--url", default="http://localhost:8000")
+    race.add_argument("--rooms", type=int, default=10)
+    race.add_argument("--attempts", type=int, default=50, help="concurrent booking attempts per room")
+    race.add_argument("--concurrency", type=int, default=200)
+
+    seeding = subparsers.add_parser("seed", help="generate a synthetic data set in the local database")
+    seeding.add_argument("--properties", type=int, default=20)
+    seeding.add_argument("--rooms", type=int, default=25, help="rooms per property")
+    seeding.add_argument("--years", type=int, default=3, help="years of booking, payment and request history")
+    seeding.add_argument("--requests-per-day", type=float, default=0.5, help="rental requests per property per day")
+    seeding.add_argument("--random-seed", type=int, default=42)
+    seeding.add_argument("--reset", action="store_true", help="truncate all tables first")
+
+    suite = subparsers.add_parser("suite", help="run the scripted workloads in-process")
+    suite.add_argument("--workloads", nargs="+", choices=list(WORKLOADS), default=list(WORKLOADS))
+    suite.add_argument("--requests", type=int, default=2000, help="measured requests per workload")
+    suite.add_argument("--warmup", type=int, default=200)
+    suite.add_argument("--concurrency", type=int, default=50)
+    suite.add_argument("--random-seed", type=int, default=42)
+    suite.add_argument("--output", default="benchmark_results.json")
+
+    compare = subparsers.add_parser("compare", help="compare two suite result files")
+    compare.add_argument("baseline")
+    compare.add_argument("current")
+    compare.add_argument("--threshold", type=float, default=10.0, help="allowed p95 increase in percent")
+
+    read_path = subparsers.add_parser("read-path", help="compare the ORM and fast list read paths in-process")
+    read_path.add_argument("--requests", type=int, default=50, help="requests per path and mode")
+    read_path.add_argument("--paths", nargs="+", default=READ_PATH_PATHS)
+
+    args = parser.parse_args()
+    if args.command == "modes":
+        asyncio.run(compare_modes(args))
+    elif args.command == "booking-race":
+        asyncio.run(booking_race(args))
+    elif args.command == "seed":
+        seed(args)
+    elif args.command == "suite":
+        asyncio.run(run_suite(args))
+    elif args.command == "compare":
+        compare_results(args)
+    elif args.command == "read-path":
+        asyncio.run(compare_read_paths(args))
+
+
+if __name__ == "__main__":
+    main()
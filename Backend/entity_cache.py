@@ -0,0 +1,191 @@
+"""
+Read-through cache for the single-entity GET endpoints.
+
+Entries are keyed by entity type and id ("room:42") and hold the JSON-ready response
+body. The write handlers invalidate the keys they touch, and every entry also expires
+after a TTL, which bounds staleness between processes that each keep a local cache.
+
+Backends:
+  - LRUCacheBackend:        bounded in-process LRU (default)
+  - RedisCacheBackend:      shared cache across workers/instances (needs the `redis` package)
+  - FakeSharedCacheBackend: in-process stand-in for the shared backend, for tests
+"""
+from collections import OrderedDict
+import json
+import threading
+import time
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+
+class LRUCacheBackend:
+    blocking = False    # calls only wait on an in-process lock
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self.entries[key]
+                self.expirations += 1
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, keys: list):
+        with self.lock:
+            for key in keys:
+                self.entries.pop(key, None)
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "backend": "memory",
+                "entries": len(self.entries),
+                "max_entries": self.max_entries,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+class FakeSharedCacheBackend:
+    """Behaves like RedisCacheBackend (JSON values, TTL, shared store) without a server."""
+
+    blocking = False
+
+    def __init__(self, ttl: float, store: dict = None):
+        self.ttl = ttl
+        self.store = store if store is not None else {}
+        self.lock = threading.Lock()
+        self.expirations = 0
+
+    def get(self, key: str):
+        with self.lock:
+            entry = self.store.get(key)
+            if entry is None:
+                return None
+            expires_at, payload = entry
+            if expires_at < time.monotonic():
+                del self.store[key]
+                self.expirations += 1
+                return None
+            return json.loads(payload)
+
+    def set(self, key: str, value):
+        with self.lock:
+            self.store[key] = (time.monotonic() + self.ttl, json.dumps(value))
+
+    def delete(self, keys: list):
+        with self.lock:
+            for key in keys:
+                self.store.pop(key, None)
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {"backend": "fake-shared", "entries": len(self.store), "expirations": self.expirations}
+
+
+class RedisCacheBackend:
+    blocking = True     # every call is a network round trip
+
+    def __init__(self, url: str, ttl: float, prefix: str = "rentlok:"):
+        if redis is None:
+            raise RuntimeError("The redis package is required for the redis cache backend")
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key: str):
+        payload = self.client.get(self.prefix + key)
+        return None if payload is None else json.loads(payload)
+
+    def set(self, key: str, value):
+        self.client.set(self.prefix + key, json.dumps(value), ex=max(1, int(self.ttl)))
+
+    def delete(self, keys: list):
+        if keys:
+            self.client.delete(*(self.prefix + key for key in keys))
+
+    def stats(self) -> dict:
+        info = self.client.info("stats")
+        return {"backend": "redis", "evictions": info.get("evicted_keys"), "expirations": info.get("expired_keys")}
+
+
+def create_cache_backend(kind: str, max_entries: int, ttl: float, redis_url: str = None):
+    if kind == "memory":
+        return LRUCacheBackend(max_entries, ttl)
+    if kind == "redis":
+        return RedisCacheBackend(redis_url, ttl)
+    if kind == "fake-shared":
+        return FakeSharedCacheBackend(ttl)
+    raise ValueError(f"Unknown cache backend: {kind}")
+
+
+class EntityCache:
+    def __init__(self, backend, enabled: bool = True):
+        self.backend = backend
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def key(entity: str, entity_id: int) -> str:
+        return f"{entity}:{entity_id}"
+
+    def get(self, entity: str, entity_id: int):
+        if not self.enabled:
+            return None
+        value = self.backend.get(self.key(entity, entity_id))
+        with self.lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, entity: str, entity_id: int, value):
+        if self.enabled:
+            self.backend.set(self.key(entity, entity_id), value)
+
+    def invalidate(self, entity: str, *entity_ids):
+        if not self.enabled or not entity_ids:
+            return
+        self.backend.delete([self.key(entity, entity_id) for entity_id in entity_ids])
+        with self.lock:
+            self.invalidations += len(entity_ids)
+
+    def stats(self) -> dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+            stats = {
+                "enabled": self.enabled,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "invalidations": self.invalidations,
+            }
+        stats.update(self.backend.stats())
+        return stats
@@ -0,0 +1,113 @@
+"""
+History compaction: moves long-inactive rows out of the live tables.
+
+Run it from cron, or as a long-running process next to the API service:
+
+    python history_compaction.py            # one pass every COMPACTION_INTERVAL seconds
+    python history_compaction.py --once
+
+Properties, rooms, tenants and bookings are soft-deleted (is_active = 0), so the live
+tables and their indexes would otherwise keep every row ever deactivated. Each pass
+moves the rows that have been inactive for longer than COMPACT_AFTER_DAYS to
+<table>_history, COMPACTION_BATCH_SIZE rows per transaction. The move is a single
+DELETE ... RETURNING feeding an INSERT, so a row is always in exactly one of the two
+tables. Rows still referenced from a live table (a booking with payments, a room with
+bookings) stay until the referencing rows are gone. Bookings are compacted before
+rooms and tenants, and those before properties, so a whole property can leave in one
+pass.
+
+The list endpoints read history back when called with active_only=false.
+"""
+from datetime import timedelta
+from sqlalchemy import select, delete, insert, exists, func
+from app_postgres_service import engine, Base, Property, Room, Tenant, Booking, HISTORY_TABLES
+import argparse
+import signal
+import time
+
+COMPACT_AFTER_DAYS = 180        # rows inactive for longer than this are moved to history
+COMPACTION_BATCH_SIZE = 1000    # rows moved per transaction
+COMPACTION_INTERVAL = 3600      # seconds between passes
+
+# Referencing tables first, so their parents are free to move in the same pass
+COMPACTION_ORDER = [Booking, Room, Tenant, Property]
+
+_stop = False
+
+
+def _request_stop(signum, frame):
+    global _stop
+    _stop = True
+
+
+def still_referenced(table) -> list:
+    # One EXISTS per foreign key that points at `table` from a live table
+    return [
+        exists().where(fk.parent == fk.column)
+        for other in Base.metadata.tables.values()
+        for fk in other.foreign_keys
+        if fk.column.table is table
+    ]
+
+
+def compact_batch(model) -> int:
+    table = model.__table__
+    history = HISTORY_TABLES[table.name]
+    key = table.primary_key.columns[0]
+
+    candidates = (
+        select(key)
+        .where(
+            table.c.is_active != 1,
+            table.c.deactivated_at < func.now() - timedelta(days=COMPACT_AFTER_DAYS),
+            *[~clause for clause in still_referenced(table)]
+        )
+        .order_by(table.c.deactivated_at)
+        .limit(COMPACTION_BATCH_SIZE)
+        .with_for_update(skip_locked=True)
+        .correlate(None)
+    )
+    moved = delete(table).where(key.in_(candidates)).returning(*table.c).cte("moved")
+    columns = list(history.c.keys())
+    stmt = (
+        insert(history)
+        .from_select(columns, select(*[moved.c[name] for name in columns]))
+        .returning(history.c[key.name])
+    )
+
+    with engine.begin() as conn:
+        return len(conn.execute(stmt).all())
+
+
+def compact_history():
+    for model in COMPACTION_ORDER:
+        total = 0
+        while not _stop:
+            moved = compact_batch(model)
+            total += moved
+            if moved < COMPACTION_BATCH_SIZE:
+                break
+        if total:
+            print(f"Moved {total} inactive row(s) to {model.__tablename__}_history")
+
+
+def run(once: bool = False):
+    signal.signal(signal.SIGINT, _request_stop)
+    signal.signal(signal.SIGTERM, _request_stop)
+
+    while not _stop:
+        try:
+            compact_history()
+        except Exception as e:
+            print(f"History compaction error: {e}")
+        if once:
+            return
+        next_run = time.monotonic() + COMPACTION_INTERVAL
+        while not _stop and time.monotonic() < next_run:
+            time.sleep(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move long-inactive rows to the history tables")
+    parser.add_argument("--once", action="store_true", help="Run a single pass and exit")
+    run(parser.parse_args().once)
@@ -0,0 +1,327 @@
+"""
+Embedded replacement for the ksqlDB tables behind the metrics service.
+
+Consumes rentlok-properties, rentlok-rooms and rentlok-requests and keeps the three
+aggregates served by app_kafka_metrics_service.py up to date incrementally:
+
+  - current_vacancies: active properties with their count of vacant, active rooms
+  - daily_requests:    active requests per (request_date, property_id)
+  - monthly_requests:  active requests per (year_month, property_id)
+
+Only the latest state of each property, room and request is kept, as compact tuples,
+and the aggregates are derived from it. State and consumed offsets are checkpointed
+together to a local JSON file, one per running instance, so a restart resumes from
+the checkpoint instead of replaying the topics from the beginning.
+
+Rows are produced in the same column order as the ksqlDB tables. A row whose
+non-key values are all None is a tombstone, exactly like a ksqlDB table update.
+"""
+from datetime import date, timedelta
+from confluent_kafka import Consumer, TopicPartition, OFFSET_BEGINNING
+import json
+import os
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+TOPICS = ["rentlok-properties", "rentlok-rooms", "rentlok-requests"]
+CHECKPOINT_VERSION = 1
+EPOCH = date(1970, 1, 1)
+
+_claimed_checkpoint = None
+
+
+def normalize_date(value) -> str:
+    # Kafka Connect's JSON converter encodes DATE columns as days since the epoch
+    if isinstance(value, int):
+        return (EPOCH + timedelta(days=value)).isoformat()
+    return str(value)[:10]
+
+
+def decode_value(value) -> dict:
+    if isinstance(value, (bytes, str)):
+        value = json.loads(value)
+    # Unwrap Kafka Connect's {"schema": ..., "payload": ...} envelope
+    if "payload" in value and "schema" in value:
+        value = value["payload"]
+    return {key.lower(): field for key, field in value.items()}
+
+
+def claim_checkpoint_path(state_dir: str) -> str:
+    """
+    Returns a checkpoint file in state_dir that no other running instance writes to.
+
+    Instances on one host (uvicorn workers included) each hold an exclusive lock on
+    one numbered slot for as long as they run; a restarted instance takes over a free
+    slot and resumes from its checkpoint. Every instance consumes all partitions, so
+    any slot's checkpoint is a valid starting point. Without fcntl the slot is per
+    process id.
+    """
+    global _claimed_checkpoint
+    if _claimed_checkpoint is not None:
+        return _claimed_checkpoint[0]
+    state_dir = os.path.abspath(state_dir)
+    os.makedirs(state_dir, exist_ok=True)
+    if fcntl is None:
+        return os.path.join(state_dir, f"metrics_state.{os.getpid()}.json")
+
+    slot = 0
+    while True:
+        lock = open(os.path.join(state_dir, f"metrics_state.{slot}.lock"), "w")
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock.close()
+            slot += 1
+            continue
+        # The lock file stays open, and locked, until the process exits
+        _claimed_checkpoint = (os.path.join(state_dir, f"metrics_state.{slot}.json"), lock)
+        return _claimed_checkpoint[0]
+
+
+class InMemoryTopicSource:
+    """In-process stand-in for KafkaTopicSource: one partition per topic."""
+
+    def __init__(self):
+        self.topics = {topic: [] for topic in TOPICS}
+        self.positions = {topic: 0 for topic in TOPICS}
+
+    def publish(self, topic: str, value: dict):
+        self.topics[topic].append(json.dumps(value))
+
+    def seek(self, offsets: dict):
+        for (topic, partition), offset in offsets.items():
+            self.positions[topic] = offset + 1
+
+    def poll(self, timeout: float = 0.0) -> list:
+        records = []
+        for topic, messages in self.topics.items():
+            for offset in range(self.positions[topic], len(messages)):
+                records.append((topic, 0, offset, messages[offset]))
+            self.positions[topic] = len(messages)
+        return records
+
+    def close(self):
+        pass
+
+
+class KafkaTopicSource:
+    """
+    Reads every partition of the topics with a plain consumer. Partitions are assigned
+    explicitly rather than through a consumer group: each instance keeps its own full
+    copy of the aggregates, so it must see every record, not a share of them. Offsets
+    are owned by the checkpoint file: a partition starts right after its checkpointed
+    offset, or at the beginning when there is none, since state is rebuilt from history.
+    Topic metadata is re-read every metadata_refresh seconds to pick up new partitions.
+    """
+
+    def __init__(self, config: dict, max_records: int = 5000, metadata_refresh: float = 60.0):
+        self.consumer = Consumer({**config, "enable.auto.commit": False})
+        self.max_records = max_records
+        self.metadata_refresh = metadata_refresh
+        self.offsets = {}
+        self.assigned = set()
+        self.metadata_checked = None
+
+    def seek(self, offsets: dict):
+        self.offsets = dict(offsets)
+        self.assigned = set()
+        self.metadata_checked = None
+        self.consumer.assign([])
+
+    def assign_new_partitions(self):
+        added = []
+        for topic in TOPICS:
+            metadata = self.consumer.list_topics(topic, timeout=10).topics.get(topic)
+            if metadata is None or metadata.error is not None:
+                print(f"Metrics topic {topic} unavailable: {metadata.error if metadata else 'no metadata'}")
+                continue
+            for partition in metadata.partitions:
+                if (topic, partition) in self.assigned:
+                    continue
+                offset = self.offsets.get((topic, partition))
+                added.append(TopicPartition(topic, partition, offset + 1 if offset is not None else OFFSET_BEGINNING))
+                self.assigned.add((topic, partition))
+        if added:
+            self.consumer.incremental_assign(added)
+        self.metadata_checked = time.monotonic()
+
+    def poll(self, timeout: float = 1.0) -> list:
+        # Partitions are looked up on the first poll, so a broker that is down at startup
+        # shows up as a poll error and is retried like any other
+        if self.metadata_checked is None or time.monotonic() - self.metadata_checked >= self.metadata_refresh:
+            self.assign_new_partitions()
+        records = []
+        for message in self.consumer.consume(self.max_records, timeout):
+            if message.error():
+                print(f"Metrics consumer error: {message.error()}")
+                continue
+            records.append((message.topic(), message.partition(), message.offset(), message.value()))
+        return records
+
+    def close(self):
+        self.consumer.close()
+
+
+class MetricsStreamProcessor:
+    def __init__(self, source, checkpoint_path: str = None, on_change=None):
+        self.source = source
+        self.checkpoint_path = checkpoint_path
+        self.on_change = on_change
+        self.offsets = {}
+        # Latest state per entity
+        self.properties = {}        # property_id -> (property_name, address, no_of_rooms, is_active)
+        self.rooms = {}             # room_id -> (property_id, counts_as_vacant)
+        self.requests = {}          # request_id -> (request_date, property_id, is_active)
+        # Aggregates derived from the state above
+        self.vacant_rooms = {}      # property_id -> vacant active rooms
+        self.daily_counts = {}      # (request_date, property_id) -> active requests
+        self.monthly_counts = {}    # (year_month, property_id) -> active requests
+
+    # ----------- Rows -----------
+    def vacancy_row(self, property_id: int) -> list:
+        prop = self.properties.get(property_id)
+        if prop is None or prop[3] != 1:
+            return [property_id, None, None, None, None]
+        return [property_id, prop[0], prop[1], prop[2], self.vacant_rooms.get(property_id, 0)]
+
+    def request_row(self, counts: dict, key: tuple) -> list:
+        prop = self.properties.get(key[1])
+        count = counts.get(key, 0)
+        if prop is None or prop[3] != 1 or not count:
+            return [key[0], key[1], None, None, None]
+        return [key[0], key[1], prop[0], prop[1], count]
+
+    def rows(self, metric: str) -> list:
+        if metric == "current_vacancies":
+            rows = [self.vacancy_row(property_id) for property_id in self.properties]
+        elif metric == "daily_requests":
+            rows = [self.request_row(self.daily_counts, key) for key in self.daily_counts]
+        elif metric == "monthly_requests":
+            rows = [self.request_row(self.monthly_counts, key) for key in self.monthly_counts]
+        else:
+            raise ValueError(f"Unknown metric: {metric}")
+        return [row for row in rows if row[2] is not None]
+
+    def emit(self, metric: str, row: list):
+        if self.on_change is not None:
+            self.on_change(metric, row)
+
+    # ----------- Updates -----------
+    def apply_property(self, value: dict):
+        property_id = value["property_id"]
+        self.properties[property_id] = (
+            value.get("property_name"),
+            value.get("address"),
+            value.get("no_of_rooms"),
+            value.get("is_active")
+        )
+        self.emit("current_vacancies", self.vacancy_row(property_id))
+        # Name, address and is_active are joined into every request row of the property
+        for key in [key for key in self.daily_counts if key[1] == property_id]:
+            self.emit("daily_requests", self.request_row(self.daily_counts, key))
+        for key in [key for key in self.monthly_counts if key[1] == property_id]:
+            self.emit("monthly_requests", self.request_row(self.monthly_counts, key))
+
+    def apply_room(self, value: dict):
+        room_id = value["room_id"]
+        new = (value.get("property_id"), value.get("operational_status") == "vacant" and value.get("is_active") == 1)
+        old = self.rooms.get(room_id)
+        self.rooms[room_id] = new
+        if old == new:
+            return
+        if old is not None and old[1]:
+            self.vacant_rooms[old[0]] -= 1
+        if new[1]:
+            self.vacant_rooms[new[0]] = self.vacant_rooms.get(new[0], 0) + 1
+        for property_id in {old[0] if old else None, new[0]} - {None}:
+            self.emit("current_vacancies", self.vacancy_row(property_id))
+
+    def _count_request(self, request: tuple, delta: int):
+        request_date, property_id, is_active = request
+        if is_active != 1:
+            return
+        for metric, counts, key in (
+            ("daily_requests", self.daily_counts, (request_date, property_id)),
+            ("monthly_requests", self.monthly_counts, (request_date[:7], property_id)),
+        ):
+            counts[key] = counts.get(key, 0) + delta
+            if not counts[key]:
+                del counts[key]
+            self.emit(metric, self.request_row(counts, key))
+
+    def apply_request(self, value: dict):
+        request_id = value["request_id"]
+        new = (normalize_date(value.get("request_date")), value.get("property_id"), value.get("is_active"))
+        old = self.requests.get(request_id)
+        self.requests[request_id] = new
+        if old == new:
+            return
+        if old is not None:
+            self._count_request(old, -1)
+        self._count_request(new, 1)
+
+    def process(self, records: list) -> int:
+        handlers = {
+            "rentlok-properties": self.apply_property,
+            "rentlok-rooms": self.apply_room,
+            "rentlok-requests": self.apply_request,
+        }
+        for topic, partition, offset, value in records:
+            try:
+                handlers[topic](decode_value(value))
+            except (KeyError, TypeError, ValueError) as e:
+                print(f"Skipping malformed {topic} record at offset {offset}: {e}")
+            self.offsets[(topic, partition)] = offset
+        return len(records)
+
+    def poll(self, timeout: float = 1.0) -> list:
+        return self.source.poll(timeout)
+
+    # ----------- Checkpoints -----------
+    def checkpoint(self):
+        if not self.checkpoint_path:
+            return
+        state = {
+            "version": CHECKPOINT_VERSION,
+            "offsets": [[topic, partition, offset] for (topic, partition), offset in self.offsets.items()],
+            "properties": [[property_id, *prop] for property_id, prop in self.properties.items()],
+            "rooms": [[room_id, *room] for room_id, room in self.rooms.items()],
+            "requests": [[request_id, *request] for request_id, request in self.requests.items()],
+        }
+        # Write then rename, so a crash never leaves a half-written checkpoint behind
+        tmp_path = self.checkpoint_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f, separators=(",", ":"))
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def restore(self):
+        state = None
+        if self.checkpoint_path and os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path) as f:
+                state = json.load(f)
+            if state.get("version") != CHECKPOINT_VERSION:
+                print("Ignoring metrics checkpoint written by another version")
+                state = None
+
+        if state is not None:
+            on_change, self.on_change = self.on_change, None
+            self.offsets = {(topic, partition): offset for topic, partition, offset in state["offsets"]}
+            self.properties = {row[0]: tuple(row[1:]) for row in state["properties"]}
+            for room_id, property_id, vacant in state["rooms"]:
+                self.rooms[room_id] = (property_id, vacant)
+                if vacant:
+                    self.vacant_rooms[property_id] = self.vacant_rooms.get(property_id, 0) + 1
+            for request_id, request_date, property_id, is_active in state["requests"]:
+                self.requests[request_id] = (request_date, property_id, is_active)
+                self._count_request(self.requests[request_id], 1)
+            self.on_change = on_change
+
+        self.source.seek(self.offsets)
+
+    def close(self):
+        self.checkpoint()
+        self.source.close()
@@ -0,0 +1,137 @@
+"""
+Outbox relay: publishes rows from the `outbox` table to the rentlok-* Kafka topics.
+
+Run one or more copies next to the API service:
+
+    python outbox_relay.py
+
+Each worker claims a batch of unsent rows with SELECT ... FOR UPDATE SKIP LOCKED,
+produces them, waits for delivery and marks the delivered rows as sent in the
+same transaction. Only the rows up to the first one that failed or was not yet
+acknowledged are marked: everything after it is produced again, in order, by the
+next batch, so a retried event never lands after a newer event for the same key.
+Delivery is at-least-once. With a single worker events keep their commit order;
+with several workers ordering is only guaranteed within a batch.
+"""
+from datetime import datetime, timedelta
+from sqlalchemy import update, delete
+from app_postgres_service import SessionLocal, OutboxEvent
+from kafka_publisher import KafkaPublisher
+from perf_metrics import ServiceMetrics, start_metrics_server
+import signal
+import time
+
+KAFKA_CONFIG = {
+    'bootstrap.servers': '192.168.56.101:9092',
+    # Batching: let librdkafka group messages instead of one request per event
+    'linger.ms': 20,
+    'batch.num.messages': 10000,
+    'compression.type': 'lz4',
+    # Keep per-key ordering intact across retries
+    'enable.idempotence': True
+}
+KAFKA_SHUTDOWN_TIMEOUT = 10      # seconds to drain queued messages on shutdown
+
+RELAY_BATCH_SIZE = 1000          # outbox rows claimed per transaction
+RELAY_IDLE_SLEEP = 0.5           # seconds to wait when the outbox is empty
+RELAY_DELIVERY_TIMEOUT = 30      # seconds to wait for a batch to be acknowledged
+OUTBOX_RETENTION_HOURS = 24      # sent rows older than this are purged
+OUTBOX_PURGE_INTERVAL = 300      # seconds between purges
+RELAY_METRICS_PORT = 9108        # Prometheus /metrics with produce and delivery latency; None to disable
+
+_stop = False
+
+
+def _request_stop(signum, frame):
+    global _stop
+    _stop = True
+
+
+def relay_batch(db, publisher: KafkaPublisher) -> int:
+    events = (
+        db.query(OutboxEvent)
+        .filter(OutboxEvent.sent_at.is_(None))
+        .order_by(OutboxEvent.event_id)
+        .limit(RELAY_BATCH_SIZE)
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+    if not events:
+        db.rollback()
+        return 0
+
+    delivered = set()
+
+    def on_delivery(event_id):
+        def callback(err, msg):
+            if err:
+                print(f"Message delivery failed for outbox event {event_id}: {err}")
+            else:
+                delivered.add(event_id)
+        return callback
+
+    for event in events:
+        publisher.produce(event.topic, event.event_key, event.payload, callback=on_delivery(event.event_id))
+
+    remaining = publisher.flush(RELAY_DELIVERY_TIMEOUT)
+    if remaining:
+        print(f"{remaining} outbox event(s) not acknowledged, they will be retried")
+
+    # Mark sent only the delivered prefix of the batch; a later event for the same key
+    # must not be marked sent while an earlier one is still to be retried
+    sent = []
+    for event in events:
+        if event.event_id not in delivered:
+            break
+        sent.append(event.event_id)
+    if len(sent) < len(events):
+        print(f"{len(events) - len(sent)} outbox event(s) from event {events[len(sent)].event_id} on will be retried")
+
+    if sent:
+        db.execute(
+            update(OutboxEvent)
+            .where(OutboxEvent.event_id.in_(sent))
+            .values(sent_at=datetime.utcnow())
+        )
+    db.commit()
+    return len(sent)
+
+
+def purge_sent_events(db):
+    cutoff = datetime.utcnow() - timedelta(hours=OUTBOX_RETENTION_HOURS)
+    db.execute(delete(OutboxEvent).where(OutboxEvent.sent_at < cutoff))
+    db.commit()
+
+
+def run():
+    signal.signal(signal.SIGINT, _request_stop)
+    signal.signal(signal.SIGTERM, _request_stop)
+
+    metrics = ServiceMetrics()
+    if RELAY_METRICS_PORT is not None:
+        start_metrics_server(metrics, RELAY_METRICS_PORT)
+    publisher = KafkaPublisher(KAFKA_CONFIG, metrics=metrics)
+    last_purge = 0.0
+    try:
+        while not _stop:
+            db = SessionLocal()
+            try:
+                sent = relay_batch(db, publisher)
+                if time.monotonic() - last_purge > OUTBOX_PURGE_INTERVAL:
+                    purge_sent_events(db)
+                    last_purge = time.monotonic()
+            except Exception as e:
+                db.rollback()
+                print(f"Outbox relay error: {e}")
+                sent = 0
+            finally:
+                db.close()
+
+            if not sent:
+                time.sleep(RELAY_IDLE_SLEEP)
+    finally:
+        publisher.close(KAFKA_SHUTDOWN_TIMEOUT)
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,144 @@
+"""
+Partition maintenance for the monthly partitions of `payments` and `requests`.
+
+Run it from cron, or as a long-running process next to the API service:
+
+    python partition_maintenance.py            # one pass every MAINTENANCE_INTERVAL seconds
+    python partition_maintenance.py --once
+
+Each pass makes sure the partitions for the next PARTITION_PREMAKE_MONTHS months exist,
+then archives every partition older than ARCHIVE_AFTER_MONTHS: the partition is
+detached, written to ARCHIVE_DIR/<table>/<partition>.csv.gz and dropped. Before a
+payments partition is dropped its per-booking monthly totals are kept in
+archived_payment_totals, so the analytics views still count the archived payments.
+A partition that was detached but not dropped, because a pass was interrupted, is
+archived again by the next pass.
+"""
+from datetime import date
+from sqlalchemy import text
+from app_postgres_service import engine
+from schema_migrations import PARTITIONED_TABLES, COLLECTED_PAYMENT_STATUSES, ensure_partitions, add_months
+import argparse
+import csv
+import gzip
+import os
+import re
+import signal
+import time
+
+ARCHIVE_AFTER_MONTHS = 36       # partitions older than this many months are archived; None to keep everything
+ARCHIVE_DIR = "partition_archive"
+ARCHIVE_LOCK_TIMEOUT = "5s"     # give up on DETACH rather than queue every query behind it
+EXPORT_BATCH_SIZE = 5000        # rows fetched per round trip while exporting
+MAINTENANCE_INTERVAL = 3600     # seconds between passes
+
+PARTITION_NAME = re.compile(r"_y(\d{4})m(\d{2})$")
+
+_stop = False
+
+
+def _request_stop(signum, frame):
+    global _stop
+    _stop = True
+
+
+def monthly_partitions(conn, table: str) -> list:
+    # (partition name, first day of its month, still attached), oldest first
+    rows = conn.execute(text("""
+        SELECT relname, relispartition
+        FROM pg_class
+        WHERE relkind = 'r' AND starts_with(relname, :prefix) AND pg_table_is_visible(oid)
+    """), {"prefix": f"{table}_y"}).all()
+    partitions = []
+    for name, attached in rows:
+        match = PARTITION_NAME.search(name)
+        if match and name == f"{table}{match.group(0)}":
+            partitions.append((name, date(int(match.group(1)), int(match.group(2)), 1), attached))
+    return sorted(partitions, key=lambda partition: partition[1])
+
+
+def export_partition(name: str, path: str) -> int:
+    # Written next to the final file and renamed, so an archive on disk is always complete
+    tmp_path = path + ".tmp"
+    rows = 0
+    with engine.connect().execution_options(stream_results=True, yield_per=EXPORT_BATCH_SIZE) as conn:
+        result = conn.execute(text(f'SELECT * FROM "{name}"'))
+        with gzip.open(tmp_path, "wt", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(result.keys())
+            for row in result:
+                writer.writerow(row)
+                rows += 1
+    os.replace(tmp_path, path)
+    return rows
+
+
+def archive_partition(table: str, name: str, attached: bool) -> int:
+    if attached:
+        with engine.begin() as conn:
+            conn.execute(text(f"SET LOCAL lock_timeout = '{ARCHIVE_LOCK_TIMEOUT}'"))
+            conn.execute(text(f'ALTER TABLE {table} DETACH PARTITION "{name}"'))
+
+    os.makedirs(os.path.join(ARCHIVE_DIR, table), exist_ok=True)
+    rows = export_partition(name, os.path.join(ARCHIVE_DIR, table, f"{name}.csv.gz"))
+
+    with engine.begin() as conn:
+        if table == "payments":
+            conn.execute(text(f"""
+                INSERT INTO archived_payment_totals (booking_id, month, payments, recorded, collected, last_collected_date)
+                SELECT booking_id,
+                       date_trunc('month', payment_date)::date,
+                       COUNT(*),
+                       SUM(amount),
+                       COALESCE(SUM(amount) FILTER (WHERE lower(payment_status) IN {COLLECTED_PAYMENT_STATUSES}), 0),
+                       MAX(payment_date) FILTER (WHERE lower(payment_status) IN {COLLECTED_PAYMENT_STATUSES})
+                FROM "{name}"
+                WHERE is_active = 1
+                GROUP BY booking_id, date_trunc('month', payment_date)
+            """))
+        conn.execute(text(f'DROP TABLE "{name}"'))
+    return rows
+
+
+def maintain_partitions():
+    created = ensure_partitions(engine)
+    if created:
+        print(f"Created {created} partition(s)")
+    if ARCHIVE_AFTER_MONTHS is None:
+        return
+
+    cutoff = add_months(date.today(), -ARCHIVE_AFTER_MONTHS)
+    for table in PARTITIONED_TABLES:
+        with engine.connect() as conn:
+            partitions = monthly_partitions(conn, table)
+        for name, month, attached in partitions:
+            if month >= cutoff or _stop:
+                break
+            try:
+                rows = archive_partition(table, name, attached)
+                print(f"Archived {name}: {rows} row(s)")
+            except Exception as e:
+                print(f"Failed to archive {name}: {e}")
+                break
+
+
+def run(once: bool = False):
+    signal.signal(signal.SIGINT, _request_stop)
+    signal.signal(signal.SIGTERM, _request_stop)
+
+    while not _stop:
+        try:
+            maintain_partitions()
+        except Exception as e:
+            print(f"Partition maintenance error: {e}")
+        if once:
+            return
+        next_run = time.monotonic() + MAINTENANCE_INTERVAL
+        while not _stop and time.monotonic() < next_run:
+            time.sleep(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create and archive monthly partitions")
+    parser.add_argument("--once", action="store_true", help="Run a single pass and exit")
+    run(parser.parse_args().once)
@@ -0,0 +1,297 @@
+"""
+Performance instrumentation shared by the RentLok services, exposed in Prometheus text
+format.
+
+  - RequestMetricsMiddleware: per-route latency histogram and status counts, plus the
+    number of SQL statements each request ran and the time spent in them. Streamed
+    responses (SSE, exports) get their own duration histogram, so open streams do not
+    show up as slow requests
+  - instrument_engine:        SQLAlchemy cursor events feeding the per-request SQL figures
+  - ServiceMetrics.observe_*: Kafka produce/delivery and ksqlDB call timings
+
+Requests slower than the configured threshold are printed together with their slowest
+SQL statements. Recording is a bisect and a few additions under a lock, and statement
+text is only kept for the slowest statements of each request, so it can stay on in
+production.
+"""
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from sqlalchemy import event
+import contextvars
+import threading
+import time
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 500, 1000)
+SLOW_SQL_KEPT = 3           # slowest statements remembered per request for the slow-request log
+SLOW_SQL_MAX_CHARS = 500    # statement text is truncated to this length in the log
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+
+def escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{escape_label(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labels: tuple = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.lock = threading.Lock()
+        self.values = {}
+
+    def inc(self, *label_values, amount: float = 1):
+        with self.lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            for label_values, value in sorted(self.values.items()):
+                lines.append(f"{self.name}{format_labels(self.labels, label_values)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        self.series = {}    # label values -> [per-bucket counts (last is +Inf), sum, count]
+
+    def observe(self, value: float, *label_values):
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(label_values)
+            if series is None:
+                series = self.series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            for label_values, (counts, total, count) in sorted(self.series.items()):
+                running = 0
+                for bound, bucket_count in zip(list(self.buckets) + ["+Inf"], counts):
+                    running += bucket_count
+                    labels = format_labels(self.labels, label_values, f'le="{bound}"')
+                    lines.append(f"{self.name}_bucket{labels} {running}")
+                labels = format_labels(self.labels, label_values)
+                lines.append(f"{self.name}_sum{labels} {round(total, 6)}")
+                lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class RequestStats:
+    __slots__ = ("statements", "sql_seconds", "slowest")
+
+    def __init__(self):
+        self.statements = 0
+        self.sql_seconds = 0.0
+        self.slowest = []   # (seconds, statement), at most SLOW_SQL_KEPT entries
+
+    def add_statement(self, seconds: float, statement: str):
+        self.statements += 1
+        self.sql_seconds += seconds
+        if len(self.slowest) < SLOW_SQL_KEPT:
+            self.slowest.append((seconds, statement))
+        else:
+            fastest = min(range(SLOW_SQL_KEPT), key=lambda i: self.slowest[i][0])
+            if seconds > self.slowest[fastest][0]:
+                self.slowest[fastest] = (seconds, statement)
+
+
+# Set by the middleware for the duration of a request; copied into threadpool workers
+# and greenlets, which update the same RequestStats object. Endpoints read their own
+# statement count from it, and a caller running the app in-process may set one before
+# the request to read the figures afterwards
+current_request = contextvars.ContextVar("current_request", default=None)
+
+
+class ServiceMetrics:
+    def __init__(self, slow_request_seconds: float = 1.0):
+        self.slow_request_seconds = slow_request_seconds
+        self.request_seconds = Histogram(
+            "rentlok_http_request_duration_seconds", "HTTP request latency by route", ("method", "route")
+        )
+        self.stream_seconds = Histogram(
+            "rentlok_http_stream_duration_seconds", "Duration of streamed responses by route", ("method", "route")
+        )
+        self.requests = Counter(
+            "rentlok_http_requests_total", "HTTP requests by route and status", ("method", "route", "status")
+        )
+        self.sql_statements = Histogram(
+            "rentlok_http_request_sql_statements", "SQL statements executed per request",
+            ("method", "route"), COUNT_BUCKETS
+        )
+        self.sql_seconds = Histogram(
+            "rentlok_http_request_sql_seconds", "Time spent in SQL per request", ("method", "route")
+        )
+        self.slow_requests = Counter(
+            "rentlok_http_slow_requests_total", "Requests slower than the slow-request threshold", ("method", "route")
+        )
+        self.kafka_produce_seconds = Histogram(
+            "rentlok_kafka_produce_seconds", "Time to hand a message to the producer queue", ("topic",)
+        )
+        self.kafka_delivery_seconds = Histogram(
+            "rentlok_kafka_delivery_seconds", "Time from produce to broker acknowledgement", ("topic",)
+        )
+        self.kafka_delivery_errors = Counter(
+            "rentlok_kafka_delivery_errors_total", "Messages the broker failed to acknowledge", ("topic",)
+        )
+        self.ksqldb_seconds = Histogram(
+            "rentlok_ksqldb_query_seconds", "ksqlDB pull query latency", ("table", "outcome")
+        )
+        self.ksqldb_rows = Histogram(
+            "rentlok_ksqldb_query_rows", "Rows returned per ksqlDB pull query", ("table",), COUNT_BUCKETS
+        )
+        self.metrics = [
+            self.request_seconds, self.stream_seconds, self.requests, self.sql_statements, self.sql_seconds, self.slow_requests,
+            self.kafka_produce_seconds, self.kafka_delivery_seconds, self.kafka_delivery_errors,
+            self.ksqldb_seconds, self.ksqldb_rows,
+        ]
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def observe_request(
+        self, method: str, route: str, path: str, status: int, seconds: float, stats: RequestStats, streamed: bool = False
+    ):
+        self.requests.inc(method, route, status)
+        self.sql_statements.observe(stats.statements, method, route)
+        self.sql_seconds.observe(stats.sql_seconds, method, route)
+        if streamed:
+            # A stream lasts as long as the client listens; it says nothing about latency
+            self.stream_seconds.observe(seconds, method, route)
+            return
+        self.request_seconds.observe(seconds, method, route)
+        if seconds >= self.slow_request_seconds:
+            self.slow_requests.inc(method, route)
+            print(
+                f"Slow request: {method} {path} -> {status} in {seconds * 1000:.0f} ms, "
+                f"{stats.statements} SQL statement(s) taking {stats.sql_seconds * 1000:.0f} ms"
+            )
+            for statement_seconds, statement in sorted(stats.slowest, reverse=True):
+                print(f"  {statement_seconds * 1000:.1f} ms: {' '.join(statement.split())[:SLOW_SQL_MAX_CHARS]}")
+
+    def observe_produce(self, topic: str, seconds: float):
+        self.kafka_produce_seconds.observe(seconds, topic)
+
+    def observe_delivery(self, topic: str, seconds: float, failed: bool):
+        if failed:
+            self.kafka_delivery_errors.inc(topic)
+        else:
+            self.kafka_delivery_seconds.observe(seconds, topic)
+
+    def observe_ksqldb(self, table: str, seconds: float, rows: int = None):
+        self.ksqldb_seconds.observe(seconds, table, "ok" if rows is not None else "error")
+        if rows is not None:
+            self.ksqldb_rows.observe(rows, table)
+
+
+class RequestMetricsMiddleware:
+    """
+    Plain ASGI middleware, so no extra task is spawned per request. A response sent
+    without Content-Length is a stream and is recorded in stream_seconds instead of the
+    request latency.
+    """
+
+    def __init__(self, app, metrics: ServiceMetrics):
+        self.app = app
+        self.metrics = metrics
+        self.routes = None
+
+    def route_label(self, scope) -> str:
+        # The router stores the matched endpoint in the scope; label by its path template
+        # so /rooms/1 and /rooms/2 share a series
+        if self.routes is None:
+            self.routes = {
+                getattr(route, "endpoint", None): route.path for route in scope["app"].routes if hasattr(route, "path")
+            }
+        return self.routes.get(scope.get("endpoint"), "unmatched")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = current_request.get()
+        token = None
+        if stats is None:
+            stats = RequestStats()
+            token = current_request.set(stats)
+        status = 500
+        streamed = False
+
+        async def send_with_status(message):
+            nonlocal status, streamed
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                # Bodiless 204 and 304 responses carry no Content-Length either
+                streamed = status not in (204, 304) and all(
+                    name.lower() != b"content-length" for name, value in message.get("headers", [])
+                )
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            seconds = time.perf_counter() - start
+            if token is not None:
+                current_request.reset(token)
+            self.metrics.observe_request(
+                scope["method"], self.route_label(scope), scope["path"], status, seconds, stats, streamed
+            )
+
+
+def instrument_engine(sync_engine):
+    # Only statements run on behalf of a request are timed; background work is skipped
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is not None and current_request.get() is not None:
+            context._rentlok_start = time.perf_counter()
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        stats = current_request.get()
+        start = getattr(context, "_rentlok_start", None)
+        if stats is not None and start is not None:
+            stats.add_statement(time.perf_counter() - start, statement)
+
+    event.listen(sync_engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", after_cursor_execute)
+
+
+def start_metrics_server(metrics: ServiceMetrics, port: int, host: str = "0.0.0.0"):
+    # /metrics for processes without a web app of their own, such as outbox_relay.py
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE + "; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
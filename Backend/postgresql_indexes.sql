@@ -7,11 +7,15 @@ CREATE INDEX rooms_room_property_btree_idx ON rooms(room_id, property_id);
 -- Bookings (composite index)
 CREATE INDEX bookings_ids_btree_idx ON bookings(booking_id, tenant_id, room_id, property_id);
 
--- Payments
+-- Payments (recreated on the partitioned table by schema migration 5)
 CREATE INDEX payments_booking_id_hash_idx ON payments USING hash(booking_id);
 
--- Requests
+-- Requests (recreated on the partitioned table by schema migration 5)
 CREATE INDEX requests_property_id_hash_idx ON requests USING hash(property_id);
 
 -- Tenants
 CREATE INDEX tenants_tenant_id_hash_idx ON tenants USING hash(tenant_id);
+
+
+-- Requests (newest-first keyset pagination on /requests/; recreated by schema migration 5)
+CREATE INDEX requests_date_id_btree_idx ON requests(request_date DESC, request_id DESC);
\ No newline at end of file
@@ -0,0 +1,536 @@
+"""
+Versioned schema changes for app_postgres_service.py.
+
+Base.metadata.create_all() only creates missing tables, so anything beyond that
+(materialized views, constraints on existing tables, triggers, ...) is listed here in
+order and applied once at startup. Applied versions are recorded in the
+schema_migrations table; an advisory lock keeps concurrently starting workers from
+applying the same migration twice.
+"""
+from datetime import date
+from sqlalchemy import text
+
+MIGRATIONS_LOCK_KEY = 7260001   # pg_advisory_xact_lock key reserved for migrations
+
+# Payment statuses that count as money received
+COLLECTED_PAYMENT_STATUSES = "('paid', 'completed')"
+
+# Entity tables reported by /sync, with their primary key
+SYNC_TABLES = [
+    ("properties", "property_id"),
+    ("rooms", "room_id"),
+    ("tenants", "tenant_id"),
+    ("bookings", "booking_id"),
+    ("payments", "payment_id"),
+    ("requests", "request_id"),
+]
+
+# change_txid is the id of the transaction that last inserted or updated the row
+TRACK_ROW_CHANGE_FUNCTION = """
+CREATE OR REPLACE FUNCTION track_row_change() RETURNS trigger AS $$
+BEGIN
+    NEW.change_txid := txid_current();
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql
+"""
+
+
+def change_tracking_statements(table: str, key: str) -> list:
+    return [
+        f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS change_txid BIGINT",
+        f"UPDATE {table} SET change_txid = txid_current() WHERE change_txid IS NULL",
+        f"ALTER TABLE {table} ALTER COLUMN change_txid SET NOT NULL",
+        f"CREATE TRIGGER {table}_track_change BEFORE INSERT OR UPDATE ON {table} "
+        f"FOR EACH ROW EXECUTE FUNCTION track_row_change()",
+        f"CREATE INDEX IF NOT EXISTS {table}_change_txid_idx ON {table}(change_txid, {key})",
+    ]
+
+
+# Monthly range-partitioned tables and their partition key. Partitions are named
+# <table>_yYYYYmMM; partition_maintenance.py creates future ones and archives old ones.
+# Rows dated outside every monthly partition land in <table>_default and move to their
+# month's partition once it is created.
+PARTITIONED_TABLES = {"payments": "payment_date", "requests": "request_date"}
+PARTITION_PREMAKE_MONTHS = 3    # months ahead of the current one that always have a partition
+
+CREATE_MONTHLY_PARTITIONS_FUNCTION = """
+CREATE OR REPLACE FUNCTION create_monthly_partitions(parent TEXT, first_month DATE, last_month DATE)
+RETURNS INTEGER AS $$
+DECLARE
+    bound DATE := date_trunc('month', first_month)::date;
+    next_bound DATE;
+    partition_name TEXT;
+    default_name TEXT := parent || '_default';
+    key_column TEXT;
+    created INTEGER := 0;
+BEGIN
+    SELECT a.attname INTO key_column
+    FROM pg_partitioned_table p
+    JOIN pg_attribute a ON a.attrelid = p.partrelid AND a.attnum = p.partattrs[0]
+    WHERE p.partrelid = parent::regclass;
+
+    WHILE bound <= last_month LOOP
+        next_bound := (bound + interval '1 month')::date;
+        partition_name := parent || '_y' || to_char(bound, 'YYYY') || 'm' || to_char(bound, 'MM');
+        IF to_regclass(partition_name) IS NULL AND to_regclass(default_name) IS NULL THEN
+            EXECUTE 'CREATE TABLE ' || quote_ident(partition_name) || ' PARTITION OF ' || quote_ident(parent)
+                || ' FOR VALUES FROM (' || quote_literal(bound) || ') TO (' || quote_literal(next_bound) || ')';
+            created := created + 1;
+        ELSIF to_regclass(partition_name) IS NULL THEN
+            -- Rows of this month may already sit in the default partition: they are moved
+            -- into the new table before it is attached, which would fail otherwise
+            EXECUTE 'CREATE TABLE ' || quote_ident(partition_name)
+                || ' (LIKE ' || quote_ident(parent) || ' INCLUDING DEFAULTS INCLUDING CONSTRAINTS)';
+            EXECUTE 'WITH moved AS (DELETE FROM ' || quote_ident(default_name)
+                || ' WHERE ' || quote_ident(key_column) || ' >= ' || quote_literal(bound)
+                || ' AND ' || quote_ident(key_column) || ' < ' || quote_literal(next_bound)
+                || ' RETURNING *) INSERT INTO ' || quote_ident(partition_name) || ' SELECT * FROM moved';
+            EXECUTE 'ALTER TABLE ' || quote_ident(parent) || ' ATTACH PARTITION ' || quote_ident(partition_name)
+                || ' FOR VALUES FROM (' || quote_literal(bound) || ') TO (' || quote_literal(next_bound) || ')';
+            created := created + 1;
+        END IF;
+        bound := next_bound;
+    END LOOP;
+    RETURN created;
+END
+$$ LANGUAGE plpgsql
+"""
+
+
+def partition_table_statements(table: str, key: str, date_column: str, constraints: list, indexes: list) -> list:
+    # Swap the table for a partitioned copy: rows, column defaults and the id sequence
+    # carry over; keys, foreign keys, indexes and the change trigger are recreated
+    old = f"{table}_unpartitioned"
+    return [
+        f"ALTER TABLE {table} RENAME TO {old}",
+        f"UPDATE {old} SET {date_column} = current_date WHERE {date_column} IS NULL",
+        f"CREATE TABLE {table} (LIKE {old} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) PARTITION BY RANGE ({date_column})",
+        f"ALTER TABLE {table} ALTER COLUMN {date_column} SET NOT NULL",
+        f"SELECT create_monthly_partitions('{table}', LEAST((SELECT min({date_column}) FROM {old}), current_date), "
+        f"GREATEST((SELECT max({date_column}) FROM {old}), (current_date + interval '{PARTITION_PREMAKE_MONTHS} months')::date))",
+        f"INSERT INTO {table} SELECT * FROM {old}",
+        f"ALTER SEQUENCE {table}_{key}_seq OWNED BY NONE",
+        f"DROP TABLE {old}",
+        f"ALTER SEQUENCE {table}_{key}_seq OWNED BY {table}.{key}",
+        # The partition key has to be part of the primary key
+        f"ALTER TABLE {table} ADD PRIMARY KEY ({key}, {date_column})",
+        *constraints,
+        f"CREATE INDEX ix_{table}_{key} ON {table}({key})",
+        *indexes,
+    ] + change_tracking_statements(table, key)
+
+
+def add_months(day: date, months: int) -> date:
+    month = day.year * 12 + day.month - 1 + months
+    return date(month // 12, month % 12 + 1, 1)
+
+
+def ensure_partitions(engine, first_month: date = None, months_ahead: int = PARTITION_PREMAKE_MONTHS) -> int:
+    # Idempotent; serialized with migrations so concurrent callers do not race on CREATE TABLE
+    today = date.today()
+    first_month = first_month or today
+    created = 0
+    with engine.begin() as conn:
+        conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": MIGRATIONS_LOCK_KEY})
+        for table in PARTITIONED_TABLES:
+            created += conn.execute(
+                text("SELECT create_monthly_partitions(:parent, :first_month, :last_month)"),
+                {"parent": table, "first_month": first_month, "last_month": add_months(today, months_ahead)}
+            ).scalar_one()
+    return created
+
+
+# Tables whose soft-deleted rows history_compaction.py moves to <table>_history
+COMPACTED_TABLES = [
+    ("properties", "property_id"),
+    ("rooms", "room_id"),
+    ("tenants", "tenant_id"),
+    ("bookings", "booking_id"),
+]
+
+# deactivated_at is when is_active last dropped from 1; cleared again on reactivation
+TRACK_DEACTIVATION_FUNCTION = """
+CREATE OR REPLACE FUNCTION track_deactivation() RETURNS trigger AS $$
+BEGIN
+    IF NEW.is_active <> 1 THEN
+        NEW.deactivated_at := COALESCE(NEW.deactivated_at, now());
+    ELSE
+        NEW.deactivated_at := NULL;
+    END IF;
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql
+"""
+
+
+def history_table_statements(table: str, key: str) -> list:
+    return [
+        f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS deactivated_at TIMESTAMP",
+        # Rows that were already inactive start their clock now. Not a change delta sync
+        # clients need to see, so change_txid is left alone.
+        f"ALTER TABLE {table} DISABLE TRIGGER {table}_track_change",
+        f"UPDATE {table} SET deactivated_at = now() WHERE is_active <> 1 AND deactivated_at IS NULL",
+        f"ALTER TABLE {table} ENABLE TRIGGER {table}_track_change",
+        f"CREATE TRIGGER {table}_track_deactivation BEFORE INSERT OR UPDATE ON {table} "
+        f"FOR EACH ROW EXECUTE FUNCTION track_deactivation()",
+        f"CREATE TABLE {table}_history (LIKE {table})",
+        f"ALTER TABLE {table}_history ADD PRIMARY KEY ({key})",
+        # Active listings and lookups stay on an index that only holds live rows
+        f"CREATE INDEX {table}_active_idx ON {table}({key}) WHERE is_active = 1",
+        # Compaction candidates, oldest deactivation first
+        f"CREATE INDEX {table}_inactive_idx ON {table}(deactivated_at) WHERE is_active <> 1",
+    ]
+
+
+# Last day a booking is billed and counts as occupied. Only active bookings run on to
+# today; one that ended without a move-out date ends in its move-in month.
+BOOKING_END_DATE = (
+    "CASE WHEN b.status = 'active' THEN COALESCE(b.move_out_date, current_date) "
+    "ELSE COALESCE(b.move_out_date, b.move_in_date) END"
+)
+
+# Existing bookings that would break the overlap rule stop the migration, with their
+# ids, rather than being rewritten here: only an operator knows which booking of an
+# overlapping pair is the data-entry error. Checked among active bookings, the rows the
+# exclusion constraint covers:
+#   - a move-out before the move-in, which makes daterange() raise
+#   - two bookings of the same room whose periods overlap
+CHECK_BOOKING_PERIODS = """
+DO $$
+DECLARE
+    invalid TEXT;
+    overlapping TEXT;
+BEGIN
+    SELECT string_agg(booking_id::text, ', ' ORDER BY booking_id) INTO invalid
+    FROM bookings
+    WHERE is_active = 1 AND status = 'active' AND move_out_date < move_in_date;
+
+    SELECT string_agg(b1.booking_id || ' and ' || b2.booking_id, ', ' ORDER BY b1.booking_id, b2.booking_id) INTO overlapping
+    FROM bookings b1
+    JOIN bookings b2 ON b2.room_id = b1.room_id AND b2.booking_id > b1.booking_id
+    WHERE b1.is_active = 1 AND b1.status = 'active' AND b2.is_active = 1 AND b2.status = 'active'
+        AND (b1.move_out_date IS NULL OR b1.move_out_date >= b1.move_in_date)
+        AND (b2.move_out_date IS NULL OR b2.move_out_date >= b2.move_in_date)
+        AND daterange(b1.move_in_date, b1.move_out_date, '[)') && daterange(b2.move_in_date, b2.move_out_date, '[)');
+
+    IF invalid IS NOT NULL OR overlapping IS NOT NULL THEN
+        RAISE EXCEPTION USING
+            MESSAGE = 'Active bookings with invalid or overlapping periods',
+            DETAIL = 'Move-out before move-in: ' || COALESCE(invalid, 'none')
+                || '. Overlapping bookings of the same room: ' || COALESCE(overlapping, 'none') || '.',
+            HINT = 'Correct the move-out date, or complete or terminate the booking that ended, then restart the service.';
+    END IF;
+END
+$$
+"""
+
+
+# (version, name, statements)
+MIGRATIONS = [
+    (1, "analytics materialized views", [
+        f"""
+        CREATE MATERIALIZED VIEW analytics_monthly_revenue AS
+        SELECT b.property_id,
+               date_trunc('month', p.payment_date)::date AS month,
+               COALESCE(SUM(p.amount) FILTER (WHERE lower(p.payment_status) IN {COLLECTED_PAYMENT_STATUSES}), 0) AS collected,
+               SUM(p.amount) AS recorded,
+               COUNT(*) AS payments
+        FROM payments p
+        JOIN bookings b ON b.booking_id = p.booking_id
+        WHERE p.is_active = 1 AND p.payment_date IS NOT NULL
+        GROUP BY b.property_id, date_trunc('month', p.payment_date)
+        """,
+        "CREATE UNIQUE INDEX analytics_monthly_revenue_key ON analytics_monthly_revenue(property_id, month)",
+        # One row per property and month in which a booking was running
+        """
+        CREATE MATERIALIZED VIEW analytics_monthly_occupancy AS
+        SELECT b.property_id,
+               m.month::date AS month,
+               COUNT(DISTINCT b.room_id) AS occupied_rooms,
+               SUM(r.rent_per_month) AS expected_rent
+        FROM bookings b
+        JOIN rooms r ON r.room_id = b.room_id
+        CROSS JOIN LATERAL generate_series(
+            date_trunc('month', b.move_in_date),
+            date_trunc('month', COALESCE(b.move_out_date, current_date)),
+            interval '1 month'
+        ) AS m(month)
+        WHERE b.is_active = 1 AND b.move_in_date IS NOT NULL
+        GROUP BY b.property_id, m.month
+        """,
+        "CREATE UNIQUE INDEX analytics_monthly_occupancy_key ON analytics_monthly_occupancy(property_id, month)",
+        # Rent due over the whole booking against what has been collected for it
+        f"""
+        CREATE MATERIALIZED VIEW analytics_booking_balance AS
+        SELECT b.booking_id,
+               b.property_id,
+               b.room_id,
+               b.tenant_id,
+               r.rent_per_month * (
+                   (date_part('year', COALESCE(b.move_out_date, current_date)) * 12 + date_part('month', COALESCE(b.move_out_date, current_date)))
+                   - (date_part('year', b.move_in_date) * 12 + date_part('month', b.move_in_date))
+                   + 1
+               ) AS expected,
+               COALESCE(paid.collected, 0) AS collected,
+               paid.last_payment_date
+        FROM bookings b
+        JOIN rooms r ON r.room_id = b.room_id
+        LEFT JOIN (
+            SELECT booking_id, SUM(amount) AS collected, MAX(payment_date) AS last_payment_date
+            FROM payments
+            WHERE is_active = 1 AND lower(payment_status) IN {COLLECTED_PAYMENT_STATUSES}
+            GROUP BY booking_id
+        ) paid ON paid.booking_id = b.booking_id
+        WHERE b.is_active = 1 AND b.move_in_date IS NOT NULL
+        """,
+        "CREATE UNIQUE INDEX analytics_booking_balance_key ON analytics_booking_balance(booking_id)",
+        "CREATE INDEX analytics_booking_balance_property_idx ON analytics_booking_balance(property_id)",
+    ]),
+    (2, "no overlapping active bookings per room", [
+        # Serves the overlap check in the booking handlers
+        "CREATE INDEX bookings_active_room_idx ON bookings(room_id) WHERE is_active = 1 AND status = 'active'",
+        CHECK_BOOKING_PERIODS,
+        # The exclusion constraint needs btree_gist for the room_id equality part; where the
+        # extension cannot be installed, the row locks in the handlers are the only guard
+        """
+        DO $$
+        BEGIN
+            IF EXISTS (SELECT 1 FROM pg_available_extensions WHERE name = 'btree_gist') THEN
+                CREATE EXTENSION IF NOT EXISTS btree_gist;
+                ALTER TABLE bookings ADD CONSTRAINT bookings_room_no_overlap
+                    EXCLUDE USING gist (room_id WITH =, daterange(move_in_date, move_out_date, '[)') WITH &&)
+                    WHERE (is_active = 1 AND status = 'active');
+            ELSE
+                RAISE WARNING 'btree_gist is not available, bookings_room_no_overlap was not created';
+            END IF;
+        END
+        $$
+        """,
+    ]),
+    (3, "room search indexes", [
+        # Vacancy search without a date window: only vacant, active rooms are indexed
+        "CREATE INDEX rooms_vacant_search_idx ON rooms(property_id, rent_per_month) "
+        "INCLUDE (room_type, floor_no) WHERE is_active = 1 AND operational_status = 'vacant'",
+        # Searches with a date window also consider rooms that are occupied today
+        "CREATE INDEX rooms_active_search_idx ON rooms(property_id, room_type, rent_per_month) "
+        "INCLUDE (floor_no, operational_status) WHERE is_active = 1",
+        # The overlap probe per room reads the booked period from the index alone
+        "CREATE INDEX bookings_active_period_idx ON bookings(room_id, move_in_date, move_out_date) "
+        "WHERE is_active = 1 AND status = 'active'",
+        "DROP INDEX IF EXISTS bookings_active_room_idx",
+    ]),
+    (4, "change tracking for delta sync", [TRACK_ROW_CHANGE_FUNCTION] + [
+        statement for table, key in SYNC_TABLES for statement in change_tracking_statements(table, key)
+    ]),
+    (5, "monthly partitions for payments and requests", [
+        # The payment views are rebuilt on top of the partitioned table below
+        "DROP MATERIALIZED VIEW analytics_booking_balance",
+        "DROP MATERIALIZED VIEW analytics_monthly_revenue",
+        # Per-booking monthly totals of archived payment partitions, so the analytics
+        # views keep counting payments whose rows are no longer in the database
+        """
+        CREATE TABLE archived_payment_totals (
+            booking_id INTEGER NOT NULL,
+            month DATE NOT NULL,
+            payments INTEGER NOT NULL,
+            recorded DOUBLE PRECISION NOT NULL,
+            collected DOUBLE PRECISION NOT NULL,
+            last_collected_date DATE,
+            PRIMARY KEY (booking_id, month)
+        )
+        """,
+        CREATE_MONTHLY_PARTITIONS_FUNCTION,
+        *partition_table_statements(
+            "payments", "payment_id", "payment_date",
+            ["ALTER TABLE payments ADD FOREIGN KEY (booking_id) REFERENCES bookings(booking_id)"],
+            ["CREATE INDEX payments_booking_id_hash_idx ON payments USING hash(booking_id)"]
+        ),
+        *partition_table_statements(
+            "requests", "request_id", "request_date",
+            ["ALTER TABLE requests ADD FOREIGN KEY (property_id) REFERENCES properties(property_id)"],
+            [
+                "CREATE INDEX requests_property_id_hash_idx ON requests USING hash(property_id)",
+                "CREATE INDEX requests_date_id_btree_idx ON requests(request_date DESC, request_id DESC)",
+            ]
+        ),
+        f"""
+        CREATE MATERIALIZED VIEW analytics_monthly_revenue AS
+        SELECT b.property_id,
+               m.month,
+               SUM(m.collected) AS collected,
+               SUM(m.recorded) AS recorded,
+               SUM(m.payments)::bigint AS payments
+        FROM (
+            SELECT booking_id,
+                   date_trunc('month', payment_date)::date AS month,
+                   COALESCE(SUM(amount) FILTER (WHERE lower(payment_status) IN {COLLECTED_PAYMENT_STATUSES}), 0) AS collected,
+                   SUM(amount) AS recorded,
+                   COUNT(*) AS payments
+            FROM payments
+            WHERE is_active = 1
+            GROUP BY booking_id, date_trunc('month', payment_date)
+            UNION ALL
+            SELECT booking_id, month, collected, recorded, payments
+            FROM archived_payment_totals
+        ) m
+        JOIN bookings b ON b.booking_id = m.booking_id
+        GROUP BY b.property_id, m.month
+        """,
+        "CREATE UNIQUE INDEX analytics_monthly_revenue_key ON analytics_monthly_revenue(property_id, month)",
+        f"""
+        CREATE MATERIALIZED VIEW analytics_booking_balance AS
+        SELECT b.booking_id,
+               b.property_id,
+               b.room_id,
+               b.tenant_id,
+               r.rent_per_month * (
+                   (date_part('year', COALESCE(b.move_out_date, current_date)) * 12 + date_part('month', COALESCE(b.move_out_date, current_date)))
+                   - (date_part('year', b.move_in_date) * 12 + date_part('month', b.move_in_date))
+                   + 1
+               ) AS expected,
+               COALESCE(paid.collected, 0) AS collected,
+               paid.last_payment_date
+        FROM bookings b
+        JOIN rooms r ON r.room_id = b.room_id
+        LEFT JOIN (
+            SELECT booking_id, SUM(collected) AS collected, MAX(last_payment_date) AS last_payment_date
+            FROM (
+                SELECT booking_id, amount AS collected, payment_date AS last_payment_date
+                FROM payments
+                WHERE is_active = 1 AND lower(payment_status) IN {COLLECTED_PAYMENT_STATUSES}
+                UNION ALL
+                SELECT booking_id, collected, last_collected_date
+                FROM archived_payment_totals
+            ) collected_payments
+            GROUP BY booking_id
+        ) paid ON paid.booking_id = b.booking_id
+        WHERE b.is_active = 1 AND b.move_in_date IS NOT NULL
+        """,
+        "CREATE UNIQUE INDEX analytics_booking_balance_key ON analytics_booking_balance(booking_id)",
+        "CREATE INDEX analytics_booking_balance_property_idx ON analytics_booking_balance(property_id)",
+    ]),
+    (6, "history tables for compacted soft-deleted rows", [TRACK_DEACTIVATION_FUNCTION] + [
+        statement for table, key in COMPACTED_TABLES for statement in history_table_statements(table, key)
+    ] + [
+        # Payments of compacted bookings still count towards their property's revenue
+        "DROP MATERIALIZED VIEW analytics_monthly_revenue",
+        f"""
+        CREATE MATERIALIZED VIEW analytics_monthly_revenue AS
+        SELECT b.property_id,
+               m.month,
+               SUM(m.collected) AS collected,
+               SUM(m.recorded) AS recorded,
+               SUM(m.payments)::bigint AS payments
+        FROM (
+            SELECT booking_id,
+                   date_trunc('month', payment_date)::date AS month,
+                   COALESCE(SUM(amount) FILTER (WHERE lower(payment_status) IN {COLLECTED_PAYMENT_STATUSES}), 0) AS collected,
+                   SUM(amount) AS recorded,
+                   COUNT(*) AS payments
+            FROM payments
+            WHERE is_active = 1
+            GROUP BY booking_id, date_trunc('month', payment_date)
+            UNION ALL
+            SELECT booking_id, month, collected, recorded, payments
+            FROM archived_payment_totals
+        ) m
+        JOIN (
+            SELECT booking_id, property_id FROM bookings
+            UNION ALL
+            SELECT booking_id, property_id FROM bookings_history
+        ) b ON b.booking_id = m.booking_id
+        GROUP BY b.property_id, m.month
+        """,
+        "CREATE UNIQUE INDEX analytics_monthly_revenue_key ON analytics_monthly_revenue(property_id, month)",
+    ]),
+    # Databases that took migration 2 without btree_gist may still hold such rows, and
+    # they make the daterange() filters of the booking and room search handlers fail
+    (7, "check for invalid and overlapping booking periods", [CHECK_BOOKING_PERIODS]),
+    (8, "occupancy and balance end with the booking", [
+        "DROP MATERIALIZED VIEW analytics_monthly_occupancy",
+        # A room handed from one tenant to the next within a month is occupied, and its
+        # rent expected, once for that month
+        f"""
+        CREATE MATERIALIZED VIEW analytics_monthly_occupancy AS
+        SELECT property_id,
+               month,
+               COUNT(*) AS occupied_rooms,
+               SUM(rent_per_month) AS expected_rent
+        FROM (
+            SELECT DISTINCT b.property_id, m.month::date AS month, b.room_id, r.rent_per_month
+            FROM bookings b
+            JOIN rooms r ON r.room_id = b.room_id
+            CROSS JOIN LATERAL generate_series(
+                date_trunc('month', b.move_in_date),
+                date_trunc('month', {BOOKING_END_DATE}),
+                interval '1 month'
+            ) AS m(month)
+            WHERE b.is_active = 1 AND b.move_in_date IS NOT NULL
+        ) occupied
+        GROUP BY property_id, month
+        """,
+        "CREATE UNIQUE INDEX analytics_monthly_occupancy_key ON analytics_monthly_occupancy(property_id, month)",
+        "DROP MATERIALIZED VIEW analytics_booking_balance",
+        f"""
+        CREATE MATERIALIZED VIEW analytics_booking_balance AS
+        SELECT b.booking_id,
+               b.property_id,
+               b.room_id,
+               b.tenant_id,
+               r.rent_per_month * (
+                   (date_part('year', {BOOKING_END_DATE}) * 12 + date_part('month', {BOOKING_END_DATE}))
+                   - (date_part('year', b.move_in_date) * 12 + date_part('month', b.move_in_date))
+                   + 1
+               ) AS expected,
+               COALESCE(paid.collected, 0) AS collected,
+               paid.last_payment_date
+        FROM bookings b
+        JOIN rooms r ON r.room_id = b.room_id
+        LEFT JOIN (
+            SELECT booking_id, SUM(collected) AS collected, MAX(last_payment_date) AS last_payment_date
+            FROM (
+                SELECT booking_id, amount AS collected, payment_date AS last_payment_date
+                FROM payments
+                WHERE is_active = 1 AND lower(payment_status) IN {COLLECTED_PAYMENT_STATUSES}
+                UNION ALL
+                SELECT booking_id, collected, last_collected_date
+                FROM archived_payment_totals
+            ) collected_payments
+            GROUP BY booking_id
+        ) paid ON paid.booking_id = b.booking_id
+        WHERE b.is_active = 1 AND b.move_in_date IS NOT NULL
+        """,
+        "CREATE UNIQUE INDEX analytics_booking_balance_key ON analytics_booking_balance(booking_id)",
+        "CREATE INDEX analytics_booking_balance_property_idx ON analytics_booking_balance(property_id)",
+    ]),
+    (9, "default partitions for payments and requests", [CREATE_MONTHLY_PARTITIONS_FUNCTION] + [
+        f"CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT" for table in PARTITIONED_TABLES
+    ]),
+    # Delta sync reads compacted rows back from history in the same (change_txid, id) order
+    (10, "change tracking index on history tables", [
+        f"CREATE INDEX IF NOT EXISTS {table}_history_change_txid_idx ON {table}_history(change_txid, {key})"
+        for table, key in COMPACTED_TABLES
+    ]),
+]
+
+
+def apply_migrations(engine):
+    with engine.begin() as conn:
+        conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": MIGRATIONS_LOCK_KEY})
+        conn.exec_driver_sql(
+            "CREATE TABLE IF NOT EXISTS schema_migrations ("
+            "version INTEGER PRIMARY KEY, name TEXT NOT NULL, applied_at TIMESTAMP NOT NULL DEFAULT now())"
+        )
+        applied = set(conn.execute(text("SELECT version FROM schema_migrations")).scalars())
+
+        for version, name, statements in MIGRATIONS:
+            if version in applied:
+                continue
+            for statement in statements:
+                conn.exec_driver_sql(statement)
+            conn.execute(
+                text("INSERT INTO schema_migrations (version, name) VALUES (:version, :name)"),
+                {"version": version, "name": name}
+            )
+            print(f"Applied schema migration {version}: {name}")
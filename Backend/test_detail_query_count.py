@@ -0,0 +1,88 @@
+"""
+Query budget of the detail endpoints.
+
+Needs the PostgreSQL database configured in app_postgres_service.py; the tests are
+skipped when it cannot be reached. Run with:
+
+    python -m pytest test_detail_query_count.py
+"""
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import exc
+
+try:
+    import app_postgres_service as service
+except exc.OperationalError as e:
+    # The service creates its tables on import
+    pytest.skip(f"database not reachable: {e.orig}", allow_module_level=True)
+
+ROOMS = 12
+PAYMENTS_PER_BOOKING = 3
+
+# One statement per relationship level, whatever the number of rows below it
+PROPERTY_DETAIL_QUERIES = {1: 2, 2: 3, 3: 4}
+BOOKING_DETAIL_QUERIES = {1: 1, 2: 2}
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(service.app) as client:
+        yield client
+
+
+@pytest.fixture(scope="module")
+def seeded(client):
+    property_id = client.post(
+        "/properties/", json={"property_name": "Detail test", "address": "Test street", "no_of_rooms": ROOMS}
+    ).json()["property_id"]
+    booking_ids = []
+    for i in range(ROOMS):
+        room_id = client.post("/rooms/", json={
+            "room_no": f"D{i}", "floor_no": 1, "property_id": property_id,
+            "operational_status": "vacant", "rent_per_month": 5000
+        }).json()["room_id"]
+        tenant_id = client.post("/tenants/", json={"name": f"Detail tenant {i}", "phone_no": "9000000000"}).json()["tenant_id"]
+        booking_id = client.post("/bookings/", json={
+            "room_id": room_id, "tenant_id": tenant_id, "property_id": property_id, "status": "active"
+        }).json()["booking_id"]
+        for month in range(PAYMENTS_PER_BOOKING):
+            client.post("/payments/", json={
+                "booking_id": booking_id, "payment_type": "rent", "payment_status": "paid",
+                "amount": 5000, "payment_month": f"2024-{month + 1:02d}"
+            })
+        booking_ids.append(booking_id)
+    return property_id, booking_ids
+
+
+@pytest.mark.parametrize("depth", sorted(PROPERTY_DETAIL_QUERIES))
+def test_property_detail_query_count(client, seeded, depth):
+    property_id, _ = seeded
+    response = client.get(f"/properties/{property_id}/detail", params={"depth": depth})
+    assert response.status_code == 200
+    assert int(response.headers["X-Query-Count"]) == PROPERTY_DETAIL_QUERIES[depth]
+
+    rooms = response.json()["rooms"]
+    assert len(rooms) == ROOMS
+    if depth >= 2:
+        assert all(len(room["bookings"]) == 1 for room in rooms)
+    if depth >= 3:
+        assert all(len(room["bookings"][0]["payments"]) == PAYMENTS_PER_BOOKING for room in rooms)
+
+
+@pytest.mark.parametrize("depth", sorted(BOOKING_DETAIL_QUERIES))
+def test_booking_detail_query_count(client, seeded, depth):
+    _, booking_ids = seeded
+    response = client.get(f"/bookings/{booking_ids[0]}/detail", params={"depth": depth})
+    assert response.status_code == 200
+    assert int(response.headers["X-Query-Count"]) == BOOKING_DETAIL_QUERIES[depth]
+    if depth >= 2:
+        assert len(response.json()["payments"]) == PAYMENTS_PER_BOOKING
+
+
+def test_detail_leaves_out_bookkeeping_columns(client, seeded):
+    property_id, _ = seeded
+    detail = client.get(f"/properties/{property_id}/detail", params={"depth": 3}).json()
+    booking = detail["rooms"][0]["bookings"][0]
+    for obj in (detail, detail["rooms"][0], booking, booking["tenant"], booking["payments"][0]):
+        assert "change_txid" not in obj
+        assert "deactivated_at" not in obj
@@ -0,0 +1,195 @@
+"""
+MetricsStreamProcessor driven through InMemoryTopicSource; no Kafka needed.
+
+    python -m pytest test_metrics_stream_processor.py
+"""
+from types import SimpleNamespace
+import os
+import subprocess
+import sys
+import pytest
+import metrics_stream_processor
+from metrics_stream_processor import InMemoryTopicSource, KafkaTopicSource, MetricsStreamProcessor, OFFSET_BEGINNING
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def prop(property_id, is_active=1, name=None):
+    return {
+        "property_id": property_id, "property_name": name or f"Property {property_id}",
+        "address": f"Street {property_id}", "no_of_rooms": 4, "is_active": is_active
+    }
+
+
+def room(room_id, property_id, status="vacant", is_active=1):
+    return {"room_id": room_id, "property_id": property_id, "operational_status": status, "is_active": is_active}
+
+
+def request(request_id, property_id, request_date="2026-10-18", is_active=1):
+    return {"request_id": request_id, "request_date": request_date, "property_id": property_id, "is_active": is_active}
+
+
+@pytest.fixture
+def source():
+    source = InMemoryTopicSource()
+    source.publish("rentlok-properties", prop(1))
+    source.publish("rentlok-properties", prop(2))
+    source.publish("rentlok-rooms", room(10, 1))
+    source.publish("rentlok-rooms", room(11, 1))
+    source.publish("rentlok-rooms", room(12, 1, status="occupied"))
+    source.publish("rentlok-rooms", room(20, 2))
+    source.publish("rentlok-requests", request(100, 1))
+    source.publish("rentlok-requests", request(101, 1))
+    source.publish("rentlok-requests", request(102, 1, request_date="2026-09-30"))
+    source.publish("rentlok-requests", request(103, 2))
+    return source
+
+
+def run(processor):
+    processor.restore()
+    processor.process(processor.poll())
+    return processor
+
+
+def test_vacancies(source):
+    processor = run(MetricsStreamProcessor(source))
+    assert sorted(processor.rows("current_vacancies")) == [
+        [1, "Property 1", "Street 1", 4, 2],
+        [2, "Property 2", "Street 2", 4, 1],
+    ]
+
+    source.publish("rentlok-rooms", room(10, 1, status="occupied"))
+    source.publish("rentlok-rooms", room(12, 1))
+    source.publish("rentlok-rooms", room(11, 2))     # moved to another property
+    source.publish("rentlok-rooms", room(20, 2, is_active=0))
+    processor.process(processor.poll())
+    assert sorted(processor.rows("current_vacancies")) == [
+        [1, "Property 1", "Street 1", 4, 1],
+        [2, "Property 2", "Street 2", 4, 1],
+    ]
+
+
+def test_request_counts(source):
+    processor = run(MetricsStreamProcessor(source))
+    assert sorted(processor.rows("daily_requests")) == [
+        ["2026-09-30", 1, "Property 1", "Street 1", 1],
+        ["2026-10-18", 1, "Property 1", "Street 1", 2],
+        ["2026-10-18", 2, "Property 2", "Street 2", 1],
+    ]
+    assert sorted(processor.rows("monthly_requests")) == [
+        ["2026-09", 1, "Property 1", "Street 1", 1],
+        ["2026-10", 1, "Property 1", "Street 1", 2],
+        ["2026-10", 2, "Property 2", "Street 2", 1],
+    ]
+
+    # Kafka Connect envelope with upper-case columns and an epoch-day date (2026-10-18)
+    source.publish("rentlok-requests", {
+        "schema": {}, "payload": {"REQUEST_ID": 104, "REQUEST_DATE": 20744, "PROPERTY_ID": 2, "IS_ACTIVE": 1}
+    })
+    source.publish("rentlok-requests", request(102, 1, request_date="2026-10-01"))    # moved to another month
+    processor.process(processor.poll())
+    assert sorted(processor.rows("monthly_requests")) == [
+        ["2026-10", 1, "Property 1", "Street 1", 3],
+        ["2026-10", 2, "Property 2", "Street 2", 2],
+    ]
+
+
+def test_tombstones(source):
+    changes = []
+    processor = run(MetricsStreamProcessor(source, on_change=lambda metric, row: changes.append((metric, row))))
+    changes.clear()
+
+    source.publish("rentlok-requests", request(103, 2, is_active=0))
+    processor.process(processor.poll())
+    assert ("daily_requests", ["2026-10-18", 2, None, None, None]) in changes
+    assert ("monthly_requests", ["2026-10", 2, None, None, None]) in changes
+
+    changes.clear()
+    source.publish("rentlok-properties", prop(1, is_active=0))
+    processor.process(processor.poll())
+    assert ("current_vacancies", [1, None, None, None, None]) in changes
+    assert ("daily_requests", ["2026-10-18", 1, None, None, None]) in changes
+    assert ("monthly_requests", ["2026-09", 1, None, None, None]) in changes
+    assert [row[0] for row in processor.rows("current_vacancies")] == [2]
+    assert processor.rows("daily_requests") == []
+
+
+def test_checkpoint_restore(source, tmp_path):
+    path = str(tmp_path / "metrics_state.json")
+    processor = run(MetricsStreamProcessor(source, path))
+    processor.close()
+
+    # Records published while the processor was down are applied once, on top of the checkpoint
+    source.publish("rentlok-rooms", room(11, 1, status="occupied"))
+    source.publish("rentlok-requests", request(105, 2))
+    source.positions = {topic: 0 for topic in source.topics}
+    restored = MetricsStreamProcessor(source, path)
+    restored.restore()
+    assert restored.offsets == processor.offsets
+    assert restored.process(restored.poll()) == 2
+
+    replay = InMemoryTopicSource()
+    replay.topics = source.topics
+    replayed = run(MetricsStreamProcessor(replay))
+    for metric in ("current_vacancies", "daily_requests", "monthly_requests"):
+        assert sorted(restored.rows(metric)) == sorted(replayed.rows(metric))
+
+
+def test_checkpoint_path_per_instance(tmp_path):
+    claim = (
+        "import sys, metrics_stream_processor as m; "
+        "print(m.claim_checkpoint_path(sys.argv[1])); sys.stdout.flush(); sys.stdin.read()"
+    )
+    first = subprocess.Popen([sys.executable, "-c", claim, str(tmp_path)], cwd=HERE, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+    second = subprocess.Popen([sys.executable, "-c", claim, str(tmp_path)], cwd=HERE, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+    try:
+        paths = {first.stdout.readline().strip(), second.stdout.readline().strip()}
+    finally:
+        first.communicate("")
+        second.communicate("")
+    assert len(paths) == 2
+    assert all(os.path.dirname(path) == str(tmp_path) for path in paths)
+
+
+def test_checkpoint_from_another_version_is_ignored(source, tmp_path):
+    path = tmp_path / "metrics_state.json"
+    path.write_text('{"version": 0}')
+    processor = run(MetricsStreamProcessor(source, str(path)))
+    assert len(processor.rows("current_vacancies")) == 2
+
+
+class FakeConsumer:
+    partitions = {"rentlok-properties": 1, "rentlok-rooms": 3, "rentlok-requests": 2}
+
+    def __init__(self, config):
+        self.assignment = []
+
+    def list_topics(self, topic, timeout=None):
+        metadata = SimpleNamespace(error=None, partitions={p: None for p in range(self.partitions[topic])})
+        return SimpleNamespace(topics={topic: metadata})
+
+    def assign(self, partitions):
+        self.assignment = list(partitions)
+
+    def incremental_assign(self, partitions):
+        self.assignment.extend(partitions)
+
+
+def test_kafka_source_assigns_every_partition(monkeypatch):
+    monkeypatch.setattr(metrics_stream_processor, "Consumer", FakeConsumer)
+    source = KafkaTopicSource({"bootstrap.servers": "localhost:9092"})
+    source.seek({("rentlok-rooms", 1): 41})
+    source.assign_new_partitions()
+
+    offsets = {(tp.topic, tp.partition): tp.offset for tp in source.consumer.assignment}
+    assert len(offsets) == sum(FakeConsumer.partitions.values())
+    assert offsets[("rentlok-rooms", 1)] == 42
+    assert offsets[("rentlok-rooms", 0)] == OFFSET_BEGINNING
+
+    FakeConsumer.partitions["rentlok-requests"] = 3
+    try:
+        source.assign_new_partitions()
+    finally:
+        FakeConsumer.partitions["rentlok-requests"] = 2
+    assert len(source.consumer.assignment) == len(offsets) + 1
+    assert (source.consumer.assignment[-1].topic, source.consumer.assignment[-1].partition) == ("rentlok-requests", 2)
@@ -0,0 +1,75 @@
+"""
+Outbox relay delivery bookkeeping, with an in-process publisher instead of Kafka.
+
+Needs the PostgreSQL database configured in app_postgres_service.py; the tests are
+skipped when it cannot be reached. Run with:
+
+    python -m pytest test_outbox_relay.py
+"""
+import pytest
+from sqlalchemy import exc
+
+try:
+    import app_postgres_service as service
+except exc.OperationalError as e:
+    # The service creates its tables on import
+    pytest.skip(f"database not reachable: {e.orig}", allow_module_level=True)
+
+import outbox_relay
+from kafka_publisher import StubPublisher
+
+BATCH_SIZE = 4
+
+
+class FailingPublisher(StubPublisher):
+    """Fails delivery of the n-th produced message and acknowledges the others."""
+
+    def __init__(self, fail_at: int):
+        super().__init__()
+        self.fail_at = fail_at
+        self.produced = 0
+
+    def produce(self, topic: str, key, value, callback=None):
+        self.produced += 1
+        if self.produced == self.fail_at:
+            callback("Local: Message timed out", None)
+        else:
+            super().produce(topic, key, value, callback)
+
+
+@pytest.fixture
+def batch(monkeypatch):
+    # The ids relay_batch is about to claim: the oldest unsent events
+    monkeypatch.setattr(outbox_relay, "RELAY_BATCH_SIZE", BATCH_SIZE)
+    with service.SessionLocal() as db:
+        for i in range(BATCH_SIZE):
+            service.add_outbox_event(db, "rentlok-properties", {"property_id": 1, "version": i})
+        db.commit()
+        return [
+            event.event_id for event in
+            db.query(service.OutboxEvent)
+            .filter(service.OutboxEvent.sent_at.is_(None))
+            .order_by(service.OutboxEvent.event_id)
+            .limit(BATCH_SIZE)
+        ]
+
+
+def sent_ids(event_ids: list) -> list:
+    with service.SessionLocal() as db:
+        return [
+            event.event_id for event in
+            db.query(service.OutboxEvent)
+            .filter(service.OutboxEvent.event_id.in_(event_ids), service.OutboxEvent.sent_at.isnot(None))
+            .order_by(service.OutboxEvent.event_id)
+        ]
+
+
+def test_failed_delivery_holds_back_later_events(batch):
+    with service.SessionLocal() as db:
+        assert outbox_relay.relay_batch(db, FailingPublisher(fail_at=2)) == 1
+    # The third and fourth events were delivered but stay unsent behind the second
+    assert sent_ids(batch) == batch[:1]
+
+    with service.SessionLocal() as db:
+        assert outbox_relay.relay_batch(db, StubPublisher()) == BATCH_SIZE
+    assert sent_ids(batch) == batch